@@ -0,0 +1,78 @@
+"""
+SUMO 后端选择。
+所有模块通过 `from backend import traci` 使用 TraCI 接口，由环境变量 SUMO_BACKEND 决定实际使用的实现
+（在导入时确定，同一进程中不能切换）：
+    libsumo  SUMO 以库的形式运行在当前进程中，接口与 traci 相同，但状态查询不经过套接字；
+             每个进程只能运行一个仿真，不支持 sumo-gui 和带标签的多连接（多个仿真需放在不同的子进程中）
+    traci    无界面的 sumo 进程，通过 TCP 连接（默认）
+    gui      sumo-gui 进程，通过 TCP 连接
+"""
+import os
+
+import traci.constants as tc  # TraCI 变量常量，libsumo 使用相同的取值
+from traci import exceptions as _exceptions
+from sumolib import checkBinary
+
+BACKENDS = ("libsumo", "traci", "gui")
+DEFAULT_BACKEND = "traci"
+
+BACKEND = os.environ.get("SUMO_BACKEND", DEFAULT_BACKEND).lower()
+if BACKEND not in BACKENDS:
+    raise ValueError(f"Unknown SUMO backend {BACKEND}, available backends are: {', '.join(BACKENDS)}")
+
+if BACKEND == "libsumo":
+    import libsumo as traci
+else:
+    import traci
+
+# libsumo 抛出自己的异常类型，统一从这里导入，各后端的异常都能捕获
+TraCIException = getattr(traci, "TraCIException", _exceptions.TraCIException)
+FatalTraCIError = getattr(traci, "FatalTraCIError", _exceptions.FatalTraCIError)
+
+__all__ = ["BACKEND", "BACKENDS", "traci", "tc", "TraCIException", "FatalTraCIError", "uses_libsumo",
+           "sumo_binary", "start", "switch"]
+
+
+def uses_libsumo():
+    """当前后端是否为进程内的 libsumo"""
+    return BACKEND == "libsumo"
+
+
+def sumo_binary(gui=None):
+    """
+    获取要启动的 SUMO 可执行文件。
+    :param gui: 是否需要图形界面，为 None 时由 SUMO_BACKEND 决定（只有 gui 后端使用 sumo-gui）；
+                显式的 True/False 覆盖后端的选择（libsumo 后端不支持图形界面，总是无界面运行）
+    """
+    if gui is None:
+        gui = BACKEND == "gui"
+    return checkBinary("sumo-gui" if gui and BACKEND != "libsumo" else "sumo")
+
+
+def start(cmd, port=None, label=None):
+    """
+    启动仿真并返回其连接。
+    traci/gui 后端返回带标签的 TraCI 连接，并把它设为 traci 的当前连接；
+    libsumo 后端返回 libsumo 模块本身（模块级接口与连接对象一致），port 和 label 被忽略。
+    :param cmd: SUMO 命令行（第一个元素为可执行文件）
+    :param port: TraCI 端口，为 None 时自动选择
+    :param label: 连接标签，为 None 时使用默认连接
+    """
+    if BACKEND == "libsumo":
+        traci.start(cmd)
+        return traci
+    if label is None:
+        traci.start(cmd, port=port)
+        return traci.getConnection()
+    traci.start(cmd, port=port, label=label)
+    traci.switch(label)
+    return traci.getConnection(label)
+
+
+def switch(label):
+    """
+    切换 traci 的当前连接（使用模块级 traci 接口的代码会作用在该连接上），libsumo 后端无需切换。
+    :param label: 连接标签
+    """
+    if BACKEND != "libsumo":
+        traci.switch(label)
@@ -0,0 +1,153 @@
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# 每次运行输出目录中的文件
+RECORD_FILE = "record.json"  # 运行完成后写入的记录，存在时重新启动批量运行会跳过该运行
+STATISTICS_FILE = "statistics.xml"  # SUMO 的 --statistic-output
+LOG_FILE = "run.log"  # 运行期间工作进程和 SUMO 的标准输出和标准错误
+
+
+def run_name(map_name, scenario_num, scale, seed):
+    """每次运行的名称，也是其输出目录名"""
+    return f"{map_name}_scenario{scenario_num}_scale{scale}_seed{seed}"
+
+
+def parse_statistics(statistics_file):
+    """
+    读取 SUMO 的 --statistic-output 文件，展开为 “元素_属性” -> 数值 的字典（如 vehicleTripStatistics_timeLoss）。
+    """
+    statistics = dict()
+    for elem in ET.parse(statistics_file).getroot():
+        for key, value in elem.attrib.items():
+            try:
+                statistics[f"{elem.tag}_{key}"] = float(value)
+            except ValueError:
+                continue
+    return statistics
+
+
+def run_one(map_name, scenario_num, scale, seed, steps, output_dir):
+    """
+    在当前进程中无界面运行一个场景组合，所有输出写入该运行独立的输出目录。
+    :return: 运行记录（参数、耗时和 SUMO 统计结果）
+    """
+    from backend import traci, TraCIException, FatalTraCIError
+    from scenario_manager import runScenario
+    from simlib import configureRun
+
+    run_dir = os.path.abspath(os.path.join(output_dir, run_name(map_name, scenario_num, scale, seed)))
+    os.makedirs(run_dir, exist_ok=True)
+    # 每个工作进程只运行一个组合，直接把标准输出和标准错误重定向到运行目录（SUMO 进程继承这两个文件描述符）
+    log = open(os.path.join(run_dir, LOG_FILE), "w")
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(log.fileno(), 1)
+    os.dup2(log.fileno(), 2)
+    configureRun(gui=False, trafficScale=scale, seed=seed, logLevel=logging.WARNING,
+                 outputPrefix=run_dir + os.sep, extraArgs=["--statistic-output", STATISTICS_FILE, "--no-step-log"])
+    start = time.perf_counter()
+    if steps:
+        runScenario(map_name, scenario_num, steps)
+    else:
+        runScenario(map_name, scenario_num)
+    try:
+        # 关闭仿真后 SUMO 才会写出统计文件
+        traci.close()
+    except (TraCIException, FatalTraCIError):
+        pass  # runScenario 已经关闭了仿真
+    record = {"map": map_name, "scenario": scenario_num, "scale": scale, "seed": seed, "steps": steps,
+              "wall_time": time.perf_counter() - start, "output_dir": run_dir}
+    statistics_file = os.path.join(run_dir, STATISTICS_FILE)
+    if os.path.exists(statistics_file):
+        record.update(parse_statistics(statistics_file))
+    with open(os.path.join(run_dir, RECORD_FILE), "w", encoding="utf-8") as f:
+        json.dump(record, f)
+    return record
+
+
+def run_batch(maps, scenario_nums, scales, seeds, output_dir, steps=None, max_workers=None):
+    """
+    在进程池中无界面运行 地图 × 场景编号 × 车流缩放比例 × 随机数种子 的所有组合，
+    每个组合在新的工作进程中运行（runScenario 使用 traci 的默认连接和全局状态），输出写入独立的目录。
+    已完成的组合（输出目录中有运行记录）直接复用，中断后重新启动可以继续。
+    所有运行的记录合并写入 summary.sqlite，并导出为 summary.xlsx（每次运行一行）和 summary_by_config.csv（各种子的平均值）。
+    :param maps: 地图名称列表
+    :param scenario_nums: 场景编号列表
+    :param scales: 车流缩放比例列表
+    :param seeds: 随机数种子列表
+    :param output_dir: 输出目录
+    :param steps: 每次运行的仿真步数，为 None 时使用 runScenario 的默认值
+    :param max_workers: 同时运行的仿真数，默认为 CPU 核数
+    :return: 所有已完成运行的记录
+    """
+    from resultstore import ResultStore
+
+    os.makedirs(output_dir, exist_ok=True)
+    combinations = list(itertools.product(maps, scenario_nums, scales, seeds))
+    records, pending = [], []
+    for combination in combinations:
+        record_file = os.path.join(output_dir, run_name(*combination), RECORD_FILE)
+        if os.path.exists(record_file):
+            with open(record_file, encoding="utf-8") as f:
+                records.append(json.load(f))
+        else:
+            pending.append(combination)
+    print(f"Batch: {len(combinations)} runs, {len(records)} already finished, {len(pending)} to run")
+
+    # 使用 spawn 启动子进程，每个进程只运行一个组合，避免 traci 默认连接和日志配置在运行之间残留
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context, max_tasks_per_child=1) as pool:
+        futures = {pool.submit(run_one, *combination, steps, output_dir): combination for combination in pending}
+        for future in as_completed(futures):
+            name = run_name(*futures[future])
+            try:
+                record = future.result()
+            except Exception as e:
+                print(f"Run {name} failed: {e}")
+                continue
+            records.append(record)
+            print(f"Run {name} finished in {record['wall_time']:.1f} s")
+
+    # 合并所有运行的记录
+    summary_file = os.path.join(output_dir, "summary.sqlite")
+    if os.path.exists(summary_file):
+        os.remove(summary_file)
+    store = ResultStore(summary_file)
+    for record in sorted(records, key=lambda r: (r["map"], r["scenario"], r["scale"], r["seed"])):
+        store.append(record)
+    store.export_excel(os.path.join(output_dir, "summary.xlsx"))
+    df = store.to_dataframe()
+    store.close()
+    if not df.empty:
+        numeric = df.drop(columns=["seed", "steps", "output_dir"], errors="ignore")
+        grouped = numeric.groupby(["map", "scenario", "scale"]).mean(numeric_only=True)
+        grouped.insert(0, "runs", df.groupby(["map", "scenario", "scale"]).size())
+        grouped.to_csv(os.path.join(output_dir, "summary_by_config.csv"))
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a matrix of maps, scenarios, traffic scales and seeds headless")
+    parser.add_argument("--maps", nargs="+", required=True, help="地图名称（SCENARIO_LOCATION_CONFIG 的键）")
+    parser.add_argument("--scenarios", type=int, nargs="+", required=True, help="场景编号")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0], help="车流缩放比例")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[42], help="SUMO 随机数种子")
+    parser.add_argument("--steps", type=int, default=None, help="每次运行的仿真步数")
+    parser.add_argument("--workers", type=int, default=None, help="同时运行的仿真数，默认为 CPU 核数")
+    parser.add_argument("--output-dir", default="output/batch", help="输出目录")
+    args = parser.parse_args(argv)
+    records = run_batch(args.maps, args.scenarios, args.scales, args.seeds, args.output_dir, args.steps,
+                        args.workers)
+    print(f"{len(records)} runs summarized in {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+import argparse
+import datetime
+import importlib.util
+import itertools
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sumolib import checkBinary
+
+import backend
+from netcache import NetworkCache
+from profiling import StepProfiler
+from scenario_manager import SCENARIO_NUMBER_CONFIGS
+from simulationmanager import SimulationManager
+from sumo_env import SumoEnvWithPlatoon, RESET_MODES
+
+# 默认比较的后端（gui 后端需要图形界面，需显式指定）
+BENCHMARK_BACKENDS = ("libsumo", "traci")
+
+# 基准测试套件的默认规模：网格每边的交叉口数和车流缩放比例
+SUITE_GRID_SIZES = (2, 4, 8)
+SUITE_SCALES = (0.5, 1.0, 2.0)
+# 报告比较时视为性能退化的相对变化
+REGRESSION_TOLERANCE = 0.1
+
+
+def measure_reset_time(config_file, reset_modes=RESET_MODES, resets=10, warmup_steps=0, max_steps=500):
+    """
+    测量不同 reset 方式的平均耗时。
+    每种方式先 reset 一次（启动 SUMO 进程，state 方式同时保存预热状态），再计时后续的 resets 次 reset。
+    :return: reset 方式 -> 平均耗时（秒）的字典
+    """
+    results = dict()
+    for reset_mode in reset_modes:
+        env = SumoEnvWithPlatoon(config_file=config_file, max_steps=max_steps, reset_mode=reset_mode,
+                                 warmup_steps=warmup_steps)
+        env.reset()
+        times = []
+        for _ in range(resets):
+            start = time.perf_counter()
+            env.reset()
+            times.append(time.perf_counter() - start)
+        env.close()
+        results[reset_mode] = float(np.mean(times))
+    return results
+
+
+def _backend_steps_per_sec(config_file, steps, scenario_num, warmup_steps):
+    """在子进程中用当前 SUMO_BACKEND 运行仿真和车队逻辑，返回每秒步数"""
+    env = SumoEnvWithPlatoon(config_file=config_file, scenario_num=scenario_num, warmup_steps=warmup_steps)
+    env.reset()
+    try:
+        start = time.perf_counter()
+        done_steps = 0
+        for _ in range(steps):
+            env.conn.simulationStep()
+            env.vehicle_state.update()
+            if env.manager:
+                env.manager.handleSimulationStep()
+            done_steps += 1
+            if env.conn.simulation.getMinExpectedNumber() == 0:
+                break
+        return done_steps / (time.perf_counter() - start)
+    finally:
+        env.close()
+
+
+def measure_backend_speed(config_file, backends=BENCHMARK_BACKENDS, steps=1000, scenario_num=1, warmup_steps=0):
+    """
+    在同一场景上测量不同 SUMO 后端的每秒仿真步数（包括车辆状态快照和 SimulationManager 的处理）。
+    后端在导入时确定，因此每个后端在设置了 SUMO_BACKEND 的独立子进程中运行。
+    :return: 后端 -> 每秒步数的字典，后端不可用时为 None
+    """
+    context = multiprocessing.get_context("spawn")
+    previous = os.environ.get("SUMO_BACKEND")
+    results = dict()
+    try:
+        for name in backends:
+            if name == "libsumo" and importlib.util.find_spec("libsumo") is None:
+                print("Backend libsumo is not available: the libsumo module is not installed")
+                results[name] = None
+                continue
+            # 子进程启动时读取 SUMO_BACKEND
+            os.environ["SUMO_BACKEND"] = name
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                results[name] = pool.submit(_backend_steps_per_sec, config_file, steps, scenario_num,
+                                            warmup_steps).result()
+    finally:
+        if previous is None:
+            os.environ.pop("SUMO_BACKEND", None)
+        else:
+            os.environ["SUMO_BACKEND"] = previous
+    return results
+
+
+
+def _sumo_tool(name):
+    """获取 SUMO tools 目录中的脚本路径（SUMO_HOME 未设置时使用 eclipse-sumo 包中的 tools 目录）"""
+    sumo_home = os.environ.get("SUMO_HOME")
+    if not sumo_home:
+        import sumo
+        sumo_home = sumo.SUMO_HOME
+    return os.path.join(sumo_home, "tools", name)
+
+
+def generate_grid(output_dir, grid_size, end=900, period=1.0, seed=42):
+    """
+    用 netgenerate 生成 grid_size x grid_size 个信号灯交叉口的网格路网，用 randomTrips.py 生成随机车流。
+    已生成的场景直接复用。
+    :param output_dir: 场景文件的输出目录
+    :param grid_size: 网格每边的交叉口数
+    :param end: 车辆出发的结束时间（秒）
+    :param period: 车辆出发的平均间隔（秒），实际需求再由运行时的 --scale 缩放
+    :param seed: randomTrips 的随机数种子
+    :return: SUMO 配置文件路径
+    """
+    name = f"grid{grid_size}"
+    net_file = os.path.join(output_dir, f"{name}.net.xml")
+    trips_file = os.path.join(output_dir, f"{name}.trips.xml")
+    routes_file = os.path.join(output_dir, f"{name}.rou.xml")  # randomTrips --validate 的路线输出
+    config_file = os.path.join(output_dir, f"{name}.sumocfg")
+    if os.path.exists(config_file):
+        return config_file
+    os.makedirs(output_dir, exist_ok=True)
+    subprocess.run([checkBinary("netgenerate"), "--grid", "--grid.number", str(grid_size), "--grid.length", "200",
+                    "--default-junction-type", "traffic_light", "--output-file", net_file],
+                   check=True, stdout=subprocess.DEVNULL)
+    subprocess.run([sys.executable, _sumo_tool("randomTrips.py"), "--net-file", net_file, "--output-trip-file",
+                    trips_file, "--route-file", routes_file, "--end", str(end), "--period", str(period),
+                    "--seed", str(seed), "--validate"],
+                   check=True, stdout=subprocess.DEVNULL)
+    with open(config_file, "w", encoding="utf-8") as f:
+        f.write(f"""<configuration>
+    <input>
+        <net-file value="{os.path.basename(net_file)}"/>
+        <route-files value="{os.path.basename(trips_file)}"/>
+    </input>
+    <time>
+        <end value="{end}"/>
+    </time>
+</configuration>
+""")
+    return config_file
+
+
+def _run_scenario(config_file, scenario_num, scale, steps):
+    """在子进程中无界面运行一个场景，返回每秒步数、内存峰值、每步 TraCI 命令数和 SimulationManager 耗时"""
+    scenario_config = SCENARIO_NUMBER_CONFIGS[scenario_num]
+    cmd = [backend.sumo_binary(), "-c", config_file, "--step-length", "0.1", "--collision.action", "none",
+           "--scale", str(scale), "--no-step-log", "--no-warnings"]
+    conn = backend.start(cmd, label=f"benchmark_{os.getpid()}")
+    profiler = StepProfiler()
+    profiler.attach(conn)
+    manager = SimulationManager(
+        pCreation=scenario_config.enablePlatoons,
+        iCoordination=scenario_config.enableCoordination,
+        iZipping=scenario_config.enableZipping,
+        maxVehiclesPerPlatoon=scenario_config.maxVehiclesPerPlatoon,
+        network=NetworkCache.fromConfig(config_file, conn),
+        profiler=profiler
+    )
+    manager_time = 0.0
+    done_steps = 0
+    start = time.perf_counter()
+    try:
+        for _ in range(steps):
+            profiler.begin_step()
+            conn.simulationStep()
+            manager_start = time.perf_counter()
+            manager.handleSimulationStep()
+            manager_time += time.perf_counter() - manager_start
+            done_steps += 1
+            if conn.simulation.getMinExpectedNumber() == 0:
+                break
+        wall_time = time.perf_counter() - start
+    finally:
+        conn.close()
+    # ru_maxrss 在 Linux 上的单位为 KB；traci 后端的 SUMO 进程退出后计入 RUSAGE_CHILDREN
+    return {
+        "steps": done_steps,
+        "steps_per_sec": done_steps / wall_time,
+        "python_peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "sumo_peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+        "traci_calls_per_step": profiler.traci_calls / max(done_steps, 1),
+        "manager_ms_per_step": manager_time * 1000 / max(done_steps, 1),
+    }
+
+
+def run_suite(output_dir, grid_sizes=SUITE_GRID_SIZES, scales=SUITE_SCALES, scenario_nums=None, steps=1000):
+    """
+    在生成的网格场景上运行基准测试套件：每种网格规模、车流缩放比例和场景配置（SCENARIO_NUMBER_CONFIGS）运行一次。
+    每次运行使用独立的子进程，内存峰值互不影响，且依次运行避免相互争抢 CPU。
+    :param output_dir: 生成场景的目录
+    :param grid_sizes: 网格每边的交叉口数
+    :param scales: 车流缩放比例（SUMO --scale）
+    :param scenario_nums: 场景编号，默认为 SCENARIO_NUMBER_CONFIGS 中的所有场景
+    :param steps: 每次运行的最大仿真步数
+    :return: 基准测试报告（可写入 JSON）
+    """
+    if scenario_nums is None:
+        scenario_nums = list(SCENARIO_NUMBER_CONFIGS)
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for grid_size, scale, scenario_num in itertools.product(grid_sizes, scales, scenario_nums):
+        config_file = generate_grid(output_dir, grid_size)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(_run_scenario, config_file, scenario_num, scale, steps).result()
+        run = {"grid_size": grid_size, "junctions": grid_size * grid_size, "scale": scale,
+               "scenario": scenario_num}
+        run.update(result)
+        runs.append(run)
+        print(f"grid {grid_size}x{grid_size}, scale {scale}, scenario {scenario_num}: "
+              f"{run['steps_per_sec']:.1f} steps/s, {run['traci_calls_per_step']:.1f} TraCI calls/step, "
+              f"{run['manager_ms_per_step']:.3f} ms/step in SimulationManager")
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "backend": backend.BACKEND,
+        "steps": steps,
+        "runs": runs,
+    }
+
+
+def _run_key(run):
+    return run["grid_size"], run["scale"], run["scenario"]
+
+
+def compare_reports(baseline, current, tolerance=REGRESSION_TOLERANCE):
+    """
+    比较两个基准测试报告中相同（网格规模、缩放比例、场景）的运行。
+    每秒步数下降，或每步 TraCI 命令数、SimulationManager 耗时上升超过 tolerance 时视为退化。
+    :param baseline: 基准报告
+    :param current: 当前报告
+    :param tolerance: 允许的相对变化
+    :return: 退化列表，每项为 (运行标识, 指标, 基准值, 当前值)
+    """
+    # 指标 -> 数值越大越好
+    metrics = {"steps_per_sec": True, "traci_calls_per_step": False, "manager_ms_per_step": False}
+    baseline_runs = {_run_key(run): run for run in baseline["runs"]}
+    regressions = []
+    for run in current["runs"]:
+        key = _run_key(run)
+        previous = baseline_runs.get(key)
+        if previous is None:
+            continue
+        for metric, higher_is_better in metrics.items():
+            old, new = previous[metric], run[metric]
+            if not old:
+                continue
+            change = (new - old) / old
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            print(f"grid {key[0]}, scale {key[1]}, scenario {key[2]}, {metric}: {old:.3f} -> {new:.3f} "
+                  f"({change:+.1%}){'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append((key, metric, old, new))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark SumoEnvWithPlatoon reset modes and SUMO backends")
+    parser.add_argument("--config", default="../maps/s.sumocfg", help="SUMO 配置文件路径")
+    parser.add_argument("--resets", type=int, default=10, help="每种方式计时的 reset 次数")
+    parser.add_argument("--warmup-steps", type=int, default=0, help="每个 episode 的预热步数")
+    parser.add_argument("--backends", nargs="+", default=list(BENCHMARK_BACKENDS),
+                        help="比较每秒步数的 SUMO 后端（libsumo、traci、gui）")
+    parser.add_argument("--steps", type=int, default=1000, help="每个后端计时的仿真步数")
+    commands = parser.add_subparsers(dest="command")
+    suite_parser = commands.add_parser("suite", help="在生成的网格场景上运行基准测试套件并写入 JSON 报告")
+    suite_parser.add_argument("--output-dir", default="../output/benchmark", help="生成场景的目录")
+    suite_parser.add_argument("--report", default="../output/benchmark/report.json", help="JSON 报告路径")
+    suite_parser.add_argument("--grid-sizes", type=int, nargs="+", default=list(SUITE_GRID_SIZES),
+                              help="网格每边的交叉口数")
+    suite_parser.add_argument("--scales", type=float, nargs="+", default=list(SUITE_SCALES), help="车流缩放比例")
+    suite_parser.add_argument("--scenarios", type=int, nargs="+", default=None, help="场景编号，默认为所有场景")
+    suite_parser.add_argument("--steps", type=int, default=1000, help="每次运行的最大仿真步数")
+    compare_parser = commands.add_parser("compare", help="比较两个 JSON 报告，有性能退化时返回非零退出码")
+    compare_parser.add_argument("baseline", help="基准报告")
+    compare_parser.add_argument("current", help="当前报告")
+    compare_parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE, help="允许的相对变化")
+    args = parser.parse_args()
+
+    if args.command == "suite":
+        report = run_suite(args.output_dir, args.grid_sizes, args.scales, args.scenarios, args.steps)
+        os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+        sys.exit(0)
+    if args.command == "compare":
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline_report = json.load(f)
+        with open(args.current, encoding="utf-8") as f:
+            current_report = json.load(f)
+        regressions = compare_reports(baseline_report, current_report, args.tolerance)
+        print(f"{len(regressions)} regression(s)")
+        sys.exit(1 if regressions else 0)
+
+    reset_times = measure_reset_time(args.config, resets=args.resets, warmup_steps=args.warmup_steps)
+    baseline = reset_times["restart"]
+    for reset_mode, seconds in reset_times.items():
+        print(f"{reset_mode:>8}: {seconds * 1000:8.1f} ms per reset ({baseline / seconds:5.2f}x vs restart)")
+
+    backend_speeds = measure_backend_speed(args.config, args.backends, args.steps, warmup_steps=args.warmup_steps)
+    baseline = backend_speeds.get("traci")
+    for name, steps_per_sec in backend_speeds.items():
+        if steps_per_sec is None:
+            print(f"{name:>8}: not available")
+        elif baseline:
+            print(f"{name:>8}: {steps_per_sec:8.1f} steps/s ({steps_per_sec / baseline:5.2f}x vs traci)")
+        else:
+            print(f"{name:>8}: {steps_per_sec:8.1f} steps/s")
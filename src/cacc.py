@@ -0,0 +1,149 @@
+import numpy as np
+from backend import tc
+
+# 未通过 add_neighbor 指定邻居时，跟随车辆默认以前车和领头车辆为邻居，权重均为 1
+DEFAULT_NEIGHBOR_WEIGHT = 1.0
+
+
+class PlatoonConsensusEngine():
+    """
+    车队级 CACC 一致性控制。
+    将所有车队的加权邻接关系合并为一个稀疏（COO 边表）矩阵，一次 NumPy 运算算出所有跟随车辆
+    基于邻居误差反馈的加速度，以及离散化后的位置和速度，再通过 setSpeed（命令缓冲区）下发。
+    加速度：a_i = -sum_j w_ij * (k_p * (x_i - x_j - d_ij) + k_v * (v_i - v_j))，
+    其中 d_ij 为车队中期望的 i、j 两车位置差（由车长和期望车距决定）。
+    上一步控制、本步不再控制的车辆（车队解散、离开车队或失去所有同车道邻居）发送 setSpeed(-1)，交还 SUMO 的跟驰模型。
+    """
+
+    def __init__(self, store, stateCache, T=0.1, positionGain=0.2, speedGain=0.7, desiredGap=2.0,
+                 maxAcceleration=2.0, maxDeceleration=4.5):
+        """
+        初始化控制器。
+        :param store: 保存车辆位置、速度和加速度的 VehicleArrayStore
+        :param stateCache: 每步的车辆状态快照（VehicleStateCache），用于同步实际位置、速度和车道
+        :param T: 离散化时间步长（与仿真步长一致）
+        :param positionGain: 位置误差的调节系数 k_p
+        :param speedGain: 速度误差的调节系数 k_v
+        :param desiredGap: 期望车距（米），即前车车尾到本车车头的距离
+        :param maxAcceleration: 最大加速度
+        :param maxDeceleration: 最大减速度（正数）
+        """
+        self.store = store
+        self.stateCache = stateCache
+        self.T = T
+        self.positionGain = positionGain
+        self.speedGain = speedGain
+        self.desiredGap = desiredGap
+        self.maxAcceleration = maxAcceleration
+        self.maxDeceleration = maxDeceleration
+        self._topologies = dict()  # 车队 -> (拓扑键, 行下标, 列下标, 权重, 期望位置差)
+        self._controlled = set()  # 上一步下发了目标速度的跟随车辆
+
+    def _getTopology(self, platoon, vehicles):
+        """
+        获取车队的邻接边表（局部下标），车队成员、车长、邻居权重和期望车距都不变时复用上一次的结果。
+        :param platoon: 车队对象
+        :param vehicles: 车队中的车辆（领头车辆在前）
+        :return: (行下标, 列下标, 权重, 期望位置差)
+        """
+        names = tuple(v.getName() for v in vehicles)
+        neighborWeights = [v.getNeighborWeights() for v in vehicles]
+        key = (names, tuple(v.getLength() for v in vehicles), self.desiredGap,
+               tuple(tuple((n.getName(), w) for n, w in weights.items()) if weights else None
+                     for weights in neighborWeights))
+        cached = self._topologies.get(platoon)
+        if cached is not None and cached[0] == key:
+            return cached[1:]
+
+        # 每辆车相对领头车辆的期望位置（领头车辆为 0，向后依次减去前车车长和期望车距）
+        reference = np.zeros(len(vehicles))
+        for i in range(1, len(vehicles)):
+            reference[i] = reference[i - 1] - vehicles[i - 1].getLength() - self.desiredGap
+
+        position = {name: i for i, name in enumerate(names)}
+        rows, cols, weights = [], [], []
+        for i in range(1, len(vehicles)):
+            if neighborWeights[i]:
+                edges = [(position[n.getName()], w) for n, w in neighborWeights[i].items() if n.getName() in position]
+            else:
+                edges = [(j, DEFAULT_NEIGHBOR_WEIGHT) for j in sorted({i - 1, 0})]
+            for j, w in edges:
+                rows.append(i)
+                cols.append(j)
+                weights.append(w)
+        rows = np.array(rows, dtype=np.intp)
+        cols = np.array(cols, dtype=np.intp)
+        topology = (rows, cols, np.array(weights, dtype=np.float64), reference[rows] - reference[cols])
+        self._topologies[platoon] = (key,) + topology
+        return topology
+
+    def update(self, platoons):
+        """
+        为所有车队计算一步加速度和离散化的位置、速度更新，并下发跟随车辆的目标速度。
+        :param platoons: 活跃车队列表
+        :return: 本步控制的跟随车辆数
+        """
+        vehicles, slots = [], []
+        rows, cols, weights, offsets = [], [], [], []
+        for platoon in platoons:
+            members = platoon.getAllVehicles()
+            if len(members) < 2 or any(v.getStoreSlot() is None for v in members):
+                continue
+            r, c, w, d = self._getTopology(platoon, members)
+            base = len(vehicles)
+            rows.append(r + base)
+            cols.append(c + base)
+            weights.append(w)
+            offsets.append(d)
+            vehicles.extend(members)
+            slots.extend(v.getStoreSlot() for v in members)
+        # 删除已不在活跃车队中的车队的拓扑缓存
+        active = set(platoons)
+        for platoon in [p for p in self._topologies if p not in active]:
+            del self._topologies[platoon]
+        if not vehicles:
+            self._release(set())
+            return 0
+
+        store = self.store
+        names = [v.getName() for v in vehicles]
+        slots = np.array(slots, dtype=np.intp)
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        weights, offsets = np.concatenate(weights), np.concatenate(offsets)
+
+        # 用本步快照中的实际位置和速度同步存储
+        x = self.stateCache.getArray(tc.VAR_LANEPOSITION, names)
+        v = self.stateCache.getArray(tc.VAR_SPEED, names)
+
+        # 车道位置只在同一车道上可比，两端不在同一车道的边不参与本步控制
+        lanes = [self.stateCache.get(name, tc.VAR_LANE_ID, None) for name in names]
+        sameLane = np.fromiter((lanes[i] == lanes[j] for i, j in zip(rows, cols)), dtype=bool, count=len(rows))
+        weights = weights * sameLane
+
+        # 基于邻居误差反馈的加速度（稀疏邻接矩阵与误差向量相乘）
+        errors = self.positionGain * (x[rows] - x[cols] - offsets) + self.speedGain * (v[rows] - v[cols])
+        a = -np.bincount(rows, weights=weights * errors, minlength=len(vehicles))
+        a = np.clip(a, -self.maxDeceleration, self.maxAcceleration)
+
+        # 离散化的位置和速度更新
+        T = self.T
+        speeds = np.clip(v + a * T, 0, store.maxSpeed[slots])
+        store.position[slots] = x + v * T + 0.5 * a * T * T
+        store.speed[slots] = speeds
+        store.acceleration[slots] = a
+
+        # 只控制至少有一条有效邻接边的跟随车辆，领头车辆保持自身的驾驶行为
+        controlled = np.flatnonzero(np.bincount(rows, weights=weights, minlength=len(vehicles)) > 0)
+        for i in controlled:
+            vehicles[i].setSpeed(float(speeds[i]))
+        self._release({vehicles[i] for i in controlled})
+        return len(controlled)
+
+    def _release(self, controlled):
+        """
+        将上一步控制、本步不再控制的车辆交还 SUMO（setSpeed(-1)），已离开路网的车辆不发送命令。
+        :param controlled: 本步下发了目标速度的车辆集合
+        """
+        for vehicle in self._controlled - controlled:
+            vehicle.setSpeed(-1)
+        self._controlled = controlled
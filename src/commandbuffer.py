@@ -0,0 +1,72 @@
+from backend import traci, TraCIException
+
+
+class CommandBuffer():
+    """
+    每个仿真步的车辆设置命令缓冲区。
+    Vehicle 的 setter（包括换道请求 changeLane）只把命令放入缓冲区，在下一次 traci.simulationStep 之前
+    按放入的顺序统一发送一次；同一车辆同一属性在一步内多次设置时只发送最后一次的值。
+    SimulationManager.handleSimulationStep 结束时发送缓冲区；在仿真步循环之外（如创建车队时）放入的命令
+    会等到下一次 handleSimulationStep 结束时才发送，需要立即生效时调用 SimulationManager.flushCommands。
+    """
+
+    def __init__(self, connection=None):
+        """
+        初始化命令缓冲区。
+        :param connection: 使用的 TraCI 连接（traci.getConnection 的返回值），默认为 traci 的当前连接
+        """
+        self._traci = connection if connection is not None else traci
+        self._pending = dict()  # (车辆名称, setter 名称) -> 参数元组，按第一次放入的顺序发送
+        self.suppressed = 0  # 与上次设置的值相同而未放入缓冲区的命令数
+        self.merged = 0  # 被同一步内后续设置覆盖的命令数
+        self.sent = 0  # 实际发送的命令数
+        self.dropped = 0  # 发送时车辆已离开路网而被丢弃的命令数
+
+    def __len__(self):
+        return len(self._pending)
+
+    def suppress(self):
+        """
+        记录一条因为值未变化而被跳过的命令。
+        """
+        self.suppressed += 1
+
+    def enqueue(self, vehicle, attr, *args):
+        """
+        放入一条命令，同一车辆同一属性已有未发送的命令时用新值覆盖。
+        :param vehicle: 车辆名称
+        :param attr: traci.vehicle 中的 setter 名称，如 "setSpeed"、"changeLane"
+        :param args: setter 除车辆名称外的参数
+        """
+        key = (vehicle, attr)
+        if key in self._pending:
+            self.merged += 1
+        self._pending[key] = args
+
+    def flush(self):
+        """
+        发送缓冲区中的所有命令并清空缓冲区，应在 traci.simulationStep 之前调用。
+        :return: 本次发送的命令数
+        """
+        if not self._pending:
+            return 0
+        vehicles = self._traci.vehicle
+        sent = 0
+        for (vehicle, attr), args in self._pending.items():
+            try:
+                getattr(vehicles, attr)(vehicle, *args)
+            except TraCIException:
+                # 车辆在放入命令之后离开了路网
+                self.dropped += 1
+                continue
+            sent += 1
+        self._pending.clear()
+        self.sent += sent
+        return sent
+
+    def getCounters(self):
+        """
+        获取命令计数。
+        :return: 包含 suppressed、merged、sent 和 dropped 计数的字典
+        """
+        return {"suppressed": self.suppressed, "merged": self.merged, "sent": self.sent, "dropped": self.dropped}
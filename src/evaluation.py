@@ -0,0 +1,202 @@
+import argparse
+import math
+import multiprocessing
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from backend import tc
+from tripinfo import TripinfoAggregator
+
+# 汇总的评估指标：episode 记录中的键 -> 显示名称
+METRICS = {
+    'avg_travel_time': 'Avg Travel Time (s)',
+    'avg_delay': 'Avg Delay (s)',
+    'avg_fuel_consumption': 'Avg Fuel Consumption (L/100km)',
+    'avg_co2_emission': 'Avg CO₂ Emission (g/km)',
+    'passed_vehicles': 'Passed Vehicles',  # 从受控车道驶出、通过信号交叉口的车辆数
+}
+
+# 每个工作进程缓存已加载的策略，同一进程中的多个 episode 只加载一次
+_models = dict()
+
+
+def _load_model(model_path):
+    model = _models.get(model_path)
+    if model is None:
+        from inference import NumpyPolicy
+        model = _models[model_path] = NumpyPolicy.load(model_path)
+    return model
+
+
+def count_junction_passes(vehicle_state, controlled_lanes, approaching):
+    """
+    统计本步通过受控交叉口的车辆：上一步在受控车道（信号灯的进口车道）上、本步已驶入其他车道的车辆。
+    :param vehicle_state: 本步的车辆状态快照（VehicleStateCache）
+    :param controlled_lanes: 受控车道集合
+    :param approaching: 上一步在受控车道上的车辆集合
+    :return: (本步通过的车辆数, 本步在受控车道上的车辆集合)
+    """
+    passed = 0
+    on_approach = set()
+    for vehicle in vehicle_state.getVehicleIDs():
+        lane = vehicle_state.get(vehicle, tc.VAR_LANE_ID, None)
+        if lane in controlled_lanes:
+            on_approach.add(vehicle)
+        elif vehicle in approaching:
+            passed += 1
+    return passed, on_approach
+
+
+def evaluate_episode(model_path, config_file, seed, output_dir, scenario_num=1, max_simulation_time=500):
+    """
+    在当前进程中用独立的 SUMO 实例、TraCI 标签和 tripinfo 文件运行一个评估 episode。
+    :param model_path: PPO 模型文件路径
+    :param config_file: SUMO 配置文件路径
+    :param seed: SUMO 随机数种子
+    :param output_dir: tripinfo 文件的输出目录
+    :param scenario_num: 场景编号
+    :param max_simulation_time: 仿真时间上限（秒）
+    :return: episode 记录
+    """
+    from sumo_env import SumoEnvWithPlatoon
+
+    model = _load_model(model_path)
+    tripinfo_file = os.path.join(output_dir, f"tripinfo_seed_{seed}.xml")
+    env = SumoEnvWithPlatoon(config_file=config_file, use_gui=False, scenario_num=scenario_num,
+                             tripinfo_file=tripinfo_file, label=f"eval_seed_{seed}_{os.getpid()}", seed=seed)
+    tripinfo = TripinfoAggregator(tripinfo_file)
+    start = time.perf_counter()
+    try:
+        obs = env.reset()
+        done = False
+        episode_reward = 0
+        passed_vehicles = 0  # 本 episode 中通过受控交叉口的车辆数
+        arrived_vehicles = 0  # 本 episode 中到达终点、离开路网的车辆数
+        controlled_lanes = set(env.lane_ids)
+        approaching = set()
+        steps = 0
+        while not done and env.conn.simulation.getTime() < max_simulation_time:
+            action, _states = model.predict(obs, deterministic=True)
+            obs, reward, done, info = env.step(action)
+            episode_reward += reward
+            steps += 1
+            passed, approaching = count_junction_passes(env.vehicle_state, controlled_lanes, approaching)
+            passed_vehicles += passed
+            arrived = env.vehicle_state.getArrivedIDs()
+            if arrived:
+                arrived_vehicles += len(arrived)
+                tripinfo.poll()
+    finally:
+        # 关闭 SUMO 后 tripinfo 文件写入完成
+        env.close()
+    tripinfo.poll()
+
+    record = {'seed': seed, 'reward': float(episode_reward), 'passed_vehicles': passed_vehicles,
+              'arrived_vehicles': arrived_vehicles, 'steps': steps, 'wall_time': time.perf_counter() - start}
+    record.update(tripinfo.summary())
+    return record
+
+
+def confidence_interval(values, confidence=0.95):
+    """
+    计算均值和置信区间的半宽。
+    有 scipy 时使用 t 分布，否则使用正态近似。
+    :param values: 样本
+    :param confidence: 置信水平
+    :return: (均值, 半宽)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = values.size
+    if n == 0:
+        return math.nan, math.nan
+    mean = float(values.mean())
+    if n < 2:
+        return mean, math.nan
+    sem = float(values.std(ddof=1)) / math.sqrt(n)
+    try:
+        from scipy import stats
+        critical = stats.t.ppf((1 + confidence) / 2, n - 1)
+    except ImportError:
+        critical = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    return mean, critical * sem
+
+
+def summarize(records, confidence=0.95):
+    """
+    汇总多个 episode 的评估指标。
+    :param records: evaluate_episode 返回的 episode 记录列表
+    :param confidence: 置信水平
+    :return: 指标 -> {'mean', 'ci', 'n'} 的字典
+    """
+    summary = dict()
+    for key in METRICS:
+        mean, half_width = confidence_interval([r[key] for r in records], confidence)
+        summary[key] = {'mean': mean, 'ci': half_width, 'n': len(records)}
+    return summary
+
+
+def evaluate_parallel(model_path, config_file, seeds, max_workers=2, output_dir="../output/eval", scenario_num=1,
+                      max_simulation_time=500, result_store=None):
+    """
+    在进程池中并行运行多个评估 episode，每个 episode 使用不同的随机数种子。
+    :param model_path: PPO 模型文件路径
+    :param config_file: SUMO 配置文件路径
+    :param seeds: 随机数种子列表，每个种子运行一个 episode
+    :param max_workers: 同时运行的 SUMO 实例数
+    :param output_dir: 各 episode 的 tripinfo 文件输出目录
+    :param scenario_num: 场景编号
+    :param max_simulation_time: 每个 episode 的仿真时间上限（秒）
+    :param result_store: 可选的 ResultStore，每个 episode 完成后追加一行
+    :return: 按种子顺序排列的 episode 记录
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    records = dict()
+    # 使用 spawn 启动子进程，避免 fork 时复制 PyTorch 和 TraCI 的状态
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+        futures = {pool.submit(evaluate_episode, model_path, config_file, seed, output_dir, scenario_num,
+                               max_simulation_time): seed for seed in seeds}
+        for future in as_completed(futures):
+            seed = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                print(f"Episode with seed {seed} failed: {e}")
+                continue
+            records[seed] = record
+            if result_store is not None:
+                result_store.append(record)
+            print(f"Episode with seed {seed} finished in {record['wall_time']:.1f} s, reward {record['reward']:.2f}")
+    return [records[seed] for seed in seeds if seed in records]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate a PPO model on several seeds in parallel")
+    parser.add_argument("--model", default="../model/PPO_MODEL.zip")
+    parser.add_argument("--config", default="../maps/s.sumocfg")
+    parser.add_argument("--episodes", type=int, default=8)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--scenario", type=int, default=1)
+    parser.add_argument("--max-time", type=float, default=500)
+    parser.add_argument("--output-dir", default="../output/eval")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    args = parser.parse_args()
+
+    from resultstore import ResultStore
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    store = ResultStore(os.path.join(args.output_dir, "results.sqlite"))
+    records = evaluate_parallel(args.model, args.config, range(args.first_seed, args.first_seed + args.episodes),
+                                max_workers=args.workers, output_dir=args.output_dir, scenario_num=args.scenario,
+                                max_simulation_time=args.max_time, result_store=store)
+    store.export_excel(os.path.join(args.output_dir, "results.xlsx"))
+    store.close()
+
+    print(f"\nSummary of {len(records)} episodes ({args.confidence:.0%} confidence interval):")
+    for key, stats in summarize(records, args.confidence).items():
+        print(f"  {METRICS[key]}: {stats['mean']:.2f} ± {stats['ci']:.2f}")
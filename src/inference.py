@@ -0,0 +1,144 @@
+import argparse
+import time
+
+import numpy as np
+from gym import spaces
+
+# 策略网络中的激活函数（按 PyTorch 模块类名）
+ACTIVATIONS = {
+    'Tanh': np.tanh,
+    'ReLU': lambda x: np.maximum(x, 0),
+    'ELU': lambda x: np.where(x > 0, x, np.expm1(np.minimum(x, 0))),
+    'LeakyReLU': lambda x: np.where(x > 0, x, 0.01 * x),
+}
+
+
+class NumpyPolicy:
+    """
+    从 stable-baselines3 的 PPO MlpPolicy 中提取策略网络权重，用 NumPy 做确定性前向计算。
+    只加载一次，不经过 PyTorch 的调度开销，一次调用可以处理多个环境或多个交叉口堆叠在一起的观测。
+    """
+
+    def __init__(self, layers, action_weight, action_bias, observation_space, action_space):
+        """
+        :param layers: 策略网络的隐藏层，(权重矩阵 (输入维数, 输出维数), 偏置, 激活函数) 的列表
+        :param action_weight: 动作输出层的权重矩阵
+        :param action_bias: 动作输出层的偏置
+        :param observation_space: 观测空间
+        :param action_space: 动作空间（Discrete、MultiDiscrete 或 Box）
+        """
+        self.layers = layers
+        self.action_weight = action_weight
+        self.action_bias = action_bias
+        self.observation_space = observation_space
+        self.action_space = action_space
+        self._obs_size = int(np.prod(observation_space.shape))
+        if isinstance(action_space, spaces.MultiDiscrete):
+            # 各动作分量的 logits 在输出中的分段位置
+            self._splits = np.cumsum(action_space.nvec.ravel())[:-1]
+        elif not isinstance(action_space, (spaces.Discrete, spaces.Box)):
+            raise ValueError(f"Unsupported action space {action_space}")
+
+    @classmethod
+    def from_model(cls, model):
+        """
+        从已加载的 PPO 模型中提取策略网络。
+        :param model: stable_baselines3.PPO 模型（MlpPolicy）
+        """
+        policy = model.policy
+        layers, weight = [], None
+        for module in policy.mlp_extractor.policy_net:
+            name = type(module).__name__
+            if name == 'Linear':
+                weight = (module.weight.detach().cpu().numpy().T.astype(np.float32),
+                          module.bias.detach().cpu().numpy().astype(np.float32))
+                layers.append(weight + (None,))
+            elif name in ACTIVATIONS:
+                layers[-1] = layers[-1][:2] + (ACTIVATIONS[name],)
+            else:
+                raise ValueError(f"Unsupported policy layer {name}")
+        action_net = policy.action_net
+        return cls(layers,
+                   action_net.weight.detach().cpu().numpy().T.astype(np.float32),
+                   action_net.bias.detach().cpu().numpy().astype(np.float32),
+                   policy.observation_space, policy.action_space)
+
+    @classmethod
+    def load(cls, model_path):
+        """
+        加载 PPO 模型文件并提取策略网络。
+        :param model_path: PPO 模型文件路径
+        """
+        from stable_baselines3 import PPO
+        return cls.from_model(PPO.load(model_path, device="cpu"))
+
+    def forward(self, observations):
+        """
+        计算一批观测的动作网络输出（离散动作为 logits，连续动作为均值）。
+        :param observations: (批大小, *观测形状) 的观测数组
+        """
+        x = np.asarray(observations, dtype=np.float32).reshape(-1, self._obs_size)
+        for weight, bias, activation in self.layers:
+            x = x @ weight + bias
+            if activation is not None:
+                x = activation(x)
+        return x @ self.action_weight + self.action_bias
+
+    def predict(self, observation, state=None, episode_start=None, deterministic=True):
+        """
+        与 stable-baselines3 的 predict 接口一致的确定性动作预测。
+        单个观测返回单个动作，堆叠的观测（多一维批维度）返回一批动作。
+        :return: (动作, None)
+        """
+        observation = np.asarray(observation, dtype=np.float32)
+        batched = observation.ndim > len(self.observation_space.shape)
+        output = self.forward(observation)
+        space = self.action_space
+        if isinstance(space, spaces.Discrete):
+            actions = output.argmax(axis=1)
+        elif isinstance(space, spaces.MultiDiscrete):
+            actions = np.stack([logits.argmax(axis=1) for logits in np.split(output, self._splits, axis=1)], axis=1)
+            actions = actions.reshape((-1,) + space.nvec.shape)
+        else:
+            actions = np.clip(output, space.low.ravel(), space.high.ravel()).reshape((-1,) + space.shape)
+        return (actions if batched else actions[0]), None
+
+
+def measure_inference_latency(model_path, batch_sizes=(1, 8, 64), repeats=200):
+    """
+    比较 stable-baselines3 predict 和 NumpyPolicy 的推理延迟。
+    :param model_path: PPO 模型文件路径
+    :param batch_sizes: 每次调用堆叠的观测数
+    :param repeats: 每种批大小计时的调用次数
+    :return: 批大小 -> {'sb3': 每次调用的平均毫秒数, 'numpy': 每次调用的平均毫秒数, 'agree': 动作是否一致}
+    """
+    from stable_baselines3 import PPO
+
+    model = PPO.load(model_path, device="cpu")
+    policy = NumpyPolicy.from_model(model)
+    results = dict()
+    for batch_size in batch_sizes:
+        observations = np.stack([model.observation_space.sample() for _ in range(batch_size)])
+        timings = dict()
+        for name, predict in (('sb3', model.predict), ('numpy', policy.predict)):
+            predict(observations, deterministic=True)
+            start = time.perf_counter()
+            for _ in range(repeats):
+                predict(observations, deterministic=True)
+            timings[name] = (time.perf_counter() - start) / repeats * 1000
+        timings['agree'] = bool(np.array_equal(model.predict(observations, deterministic=True)[0],
+                                               policy.predict(observations)[0]))
+        results[batch_size] = timings
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare stable-baselines3 predict with the NumPy policy")
+    parser.add_argument("--model", default="../model/PPO_MODEL.zip", help="PPO 模型文件路径")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 64], help="每次调用堆叠的观测数")
+    parser.add_argument("--repeats", type=int, default=200, help="每种批大小计时的调用次数")
+    args = parser.parse_args()
+
+    for batch_size, timings in measure_inference_latency(args.model, args.batch_sizes, args.repeats).items():
+        print(f"batch {batch_size:>4}: sb3 {timings['sb3']:7.3f} ms, numpy {timings['numpy']:7.3f} ms "
+              f"({timings['sb3'] / timings['numpy']:5.1f}x), actions agree: {timings['agree']}")
@@ -1,15 +1,22 @@
-import traci  # 导入SUMO的TraCI库，用于与SUMO仿真进行交互
-import logging  # 导入日志模块，用于记录日志信息
+from backend import traci
 from simlib import flatten  # 从simlib模块导入flatten函数，用于展平列表
+from zipscheduler import ZipScheduler  # 增量维护的“压缩”通行顺序
+from reservation import ReservationEngine  # 基于闭式运动学的批量预留计算
 
 class IntersectionController():
-    def __init__(self, intersection, zip=True):
+    def __init__(self, intersection, zip=True, network=None, telemetry=None):
         """
         初始化交叉口控制器。
         :param intersection: 交叉口的名称或ID
         :param zip: 是否启用车辆“压缩”功能（即车辆在交叉口处合并通过）
+        :param network: 静态路网信息缓存（NetworkCache），为 None 时直接调用 TraCI
+        :param telemetry: 遥测记录器（TelemetryRecorder），为 None 时不记录交叉口状态
         """
-        lanes = traci.trafficlight.getControlledLanes(intersection)  # 获取该交叉口控制的所有车道
+        # 获取该交叉口控制的所有车道
+        if network is not None:
+            lanes = network.getControlledLanes(intersection)
+        else:
+            lanes = traci.trafficlight.getControlledLanes(intersection)
         self.lanesServed = set(lanes)  # 将车道转换为集合，方便后续操作
         self.name = intersection  # 交叉口名称
         self.platoons = []  # 存储当前管理的车队列表
@@ -17,6 +24,13 @@ class IntersectionController():
         self.platoonZips = []  # 存储“压缩”车队的列表
         self.zip = zip  # 是否启用“压缩”功能
         self._a_max = 2.0  # 最大允许加速度
+        # 按到交叉口距离排序的“压缩”通行顺序，只在车队加入、离开或变化时重建
+        # 通过交叉口的车辆（距离变为 1000）立即从顺序中移除
+        self._zipScheduler = ZipScheduler(self._getLanePosition, away=1000)
+        # 每步读取一次信号状态，为排队的车队或车辆批量计算预留时间和目标速度
+        self._reservation = ReservationEngine(intersection, lanes, self._a_max)
+        self._telemetry = telemetry
+        self._telemetryID = telemetry.registerController(intersection) if telemetry is not None else None
 
     def can_pass_green_light(self, platoon, t_green):
         """
@@ -32,7 +46,10 @@ class IntersectionController():
         将车队添加到交叉口控制器中。
         :param platoon: 要添加的车队对象
         """
-
+        self.platoons.append(platoon)  # 加入控制器管理的车队列表
+        self._zipScheduler.markDirty()
+        if self.zip:
+            platoon.addControlledLanes(self.lanesServed)  # 如果启用“压缩”功能，记录控制的车道信息
 
     def calculateNewReservedTime(self, pv, reservedTime):
         """
@@ -70,6 +87,22 @@ class IntersectionController():
         获取启用“压缩”功能时，车队通过交叉口的顺序。
         :return: 车队通过交叉口的顺序列表
         """
+        return self._zipScheduler.order()
+
+    def platoonChanged(self, platoon):
+        """
+        控制器管理的车队成员或车道发生变化时调用，使“压缩”组合在下一次更新时重建。
+        :param platoon: 发生变化的车队
+        """
+        self._zipScheduler.markDirty()
+
+    def _refreshPlatoonZips(self):
+        """
+        只在车队加入、离开、成员或车道变化后重新生成“压缩”组合，否则复用上一次的结果。
+        """
+        if self._zipScheduler.isDirty():
+            self._generatePlatoonZips()
+            self._zipScheduler.rebuild(flatten(p.getAllVehicles() for zipped in self.platoonZips for p in zipped))
 
 
     def _generatePlatoonZips(self):
@@ -105,6 +138,7 @@ class IntersectionController():
         :param platoon: 要移除的车队
         """
         self.platoons.remove(platoon)  # 从列表中移除车队
+        self._zipScheduler.markDirty()
         # 恢复默认速度行为
         platoon.removeTargetSpeed()  # 移除目标速度
         platoon.setSpeedMode(31)  # 设置速度模式为默认
@@ -119,33 +153,41 @@ class IntersectionController():
         3. 更新所有由控制器管理的车队的速度
         """
         reservedTime = 0
+        zipOrderSize = 0
         if self.zip:
-            self._generatePlatoonZips()
-            for v in self.getVehicleZipOrderThroughJunc():
-                if v.isActive() and v.getLane() in self.lanesServed:
-                    if self.can_pass_green_light(v, reservedTime):
-                        v.setSpeed(v.getMaxSpeed())
-                    else:
-                        v.setSpeed(0)
-                    reservedTime = self.calculateNewReservedTime(v, reservedTime)
+            self._refreshPlatoonZips()
+            zipOrder = self.getVehicleZipOrderThroughJunc()
+            zipOrderSize = len(zipOrder)
+            queue = [v for v in zipOrder if v.isActive() and v.getLane() in self.lanesServed]
         else:
-            for p in self.platoons:
-                # 如果车队未通过交叉口，则更新其速度
-                if p.getLane() in self.lanesServed:
-                    speed = self.getNewSpeed(p, reservedTime)
-                    if speed == -1:
-                        p.removeTargetSpeed()  # 如果速度为-1，则移除目标速度
-                    else:
-                        p.setTargetSpeed(speed)  # 否则设置目标速度
-                    reservedTime = self.calculateNewReservedTime(p, reservedTime)  # 计算新的预留时间
-        self._logIntersectionStatus(reservedTime)  # 记录交叉口状态
-
-    def _logIntersectionStatus(self, reservation=None):
-        """
-        记录交叉口的状态。
+            # 只处理未通过交叉口的车队
+            queue = [p for p in self.platoons if p.getLane() in self.lanesServed]
+        if queue:
+            self._reservation.readSignal()
+            distances = [pv.getLanePositionFromFront() for pv in queue]
+            if not self.zip:
+                # 预留按队列顺序累积，self.platoons 按加入顺序排列，先按到停车线的距离排成通行顺序
+                order = sorted(range(len(queue)), key=distances.__getitem__)
+                queue = [queue[i] for i in order]
+                distances = [distances[i] for i in order]
+            admit, speeds, reservedTime = self._reservation.plan(queue, distances, reservedTime)
+            for pv, admitted, speed in zip(queue, admit, speeds):
+                if self.zip:
+                    pv.setSpeed(pv.getMaxSpeed() if admitted else 0)
+                elif admitted:
+                    pv.removeTargetSpeed()  # 可以在绿灯内通过，移除目标速度
+                else:
+                    pv.setTargetSpeed(float(speed))  # 否则减速到预留时间到达
+        self._logIntersectionStatus(reservedTime, zipOrderSize)  # 记录交叉口状态
+
+    def _logIntersectionStatus(self, reservation=None, zipOrderSize=0):
+        """
+        记录交叉口的状态（写入遥测记录器的环形缓冲区，不做日志格式化）。
         :param reservation: 预留的时间
+        :param zipOrderSize: “压缩”通行顺序中的车辆数
         """
-
+        if self._telemetry is not None and self._telemetry.sampling:
+            self._telemetry.recordIntersection(self._telemetryID, reservation or 0, len(self.platoons), zipOrderSize)
 
     def _zipPlatoons(self, platoons):
         """
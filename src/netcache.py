@@ -0,0 +1,166 @@
+import os
+import xml.etree.ElementTree as ET
+
+import sumolib  # SUMO 的 Python 工具库，用于读取路网文件
+from backend import traci
+
+
+def _internalJunction(edgeID):
+    """
+    由内部边的 ID（形如 ":J_0"）得到所在交叉口的 ID。
+    """
+    return edgeID[1:].rsplit("_", 1)[0]
+
+
+# 路网文件的绝对路径 -> (修改时间, 解析出的路网信息)，同一进程中每个路网文件只用 sumolib 解析一次
+_netFileCache = dict()
+
+
+def netFileFromConfig(configFile):
+    """
+    从 .sumocfg 配置文件中读取路网文件路径（相对路径按配置文件所在目录解析）。
+    :param configFile: SUMO 配置文件路径
+    """
+    root = ET.parse(configFile).getroot()
+    elem = root.find("./input/net-file")
+    if elem is None:
+        elem = root.find(".//net-file")
+    if elem is None:
+        raise ValueError("No net-file in %s" % configFile)
+    return os.path.join(os.path.dirname(os.path.abspath(configFile)), elem.get("value"))
+
+
+class NetworkCache():
+    """
+    静态路网信息缓存：车道长度、车道所属的道路、车道通向的交叉口，以及每个信号灯控制的车道。
+    路网在仿真过程中不会变化，启动时加载一次，之后所有车道几何查询都不再调用 TraCI。
+    优先通过 fromConfig / fromNetFile 从路网文件加载（每个文件每个进程只解析一次，不需要 TraCI 调用）；
+    fromTraCI 每条车道需要两次、每条道路一次 TraCI 调用，只在没有路网文件时使用。
+    """
+
+    def __init__(self, laneLengths, laneEdges, laneJunctions, controlledLanes, connection=None):
+        """
+        初始化缓存，一般通过 fromConfig、fromNetFile 或 fromTraCI 创建。
+        :param laneLengths: 车道 -> 长度
+        :param laneEdges: 车道 -> 所属道路
+        :param laneJunctions: 车道 -> 通向（内部车道为所在）的交叉口
+        :param controlledLanes: 信号灯 -> 受控车道元组（与 traci.trafficlight.getControlledLanes 一致）
+        :param connection: 缓存中没有某条车道时用于补查的 TraCI 连接，默认为 traci 的当前连接
+        """
+        self._traci = connection if connection is not None else traci
+        self._laneLengths = laneLengths
+        self._laneEdges = laneEdges
+        self._laneJunctions = laneJunctions
+        self._controlledLanes = controlledLanes
+
+    @classmethod
+    def fromTraCI(cls, connection=None):
+        """
+        通过 TraCI 逐车道查询加载路网信息（每条车道两次、每条道路一次 TraCI 调用）。
+        :param connection: 使用的 TraCI 连接，默认为 traci 的当前连接
+        """
+        conn = connection if connection is not None else traci
+        laneLengths, laneEdges, laneJunctions = dict(), dict(), dict()
+        edgeJunctions = dict()
+        for lane in conn.lane.getIDList():
+            edge = conn.lane.getEdgeID(lane)
+            laneLengths[lane] = conn.lane.getLength(lane)
+            laneEdges[lane] = edge
+            if edge not in edgeJunctions:
+                edgeJunctions[edge] = _internalJunction(edge) if edge.startswith(":") else conn.edge.getToJunction(edge)
+            laneJunctions[lane] = edgeJunctions[edge]
+        controlledLanes = {tls: tuple(conn.trafficlight.getControlledLanes(tls))
+                           for tls in conn.trafficlight.getIDList()}
+        return cls(laneLengths, laneEdges, laneJunctions, controlledLanes, connection)
+
+    @classmethod
+    def fromNetFile(cls, netFile, connection=None):
+        """
+        通过 sumolib.net 读取 .net.xml 文件加载路网信息，不需要运行中的仿真。
+        解析结果按文件路径缓存，同一进程中再次加载（如每个 episode 重建 SimulationManager）时直接复用。
+        :param netFile: 路网文件路径
+        :param connection: 缓存中没有某条车道时用于补查的 TraCI 连接，默认为 traci 的当前连接
+        """
+        path = os.path.abspath(netFile)
+        mtime = os.path.getmtime(path)
+        cached = _netFileCache.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = _netFileCache[path] = (mtime, cls._parseNetFile(path))
+        # 各实例共享解析出的字典（补查的结果对同一路网同样有效），补查时使用各自的连接
+        return cls(*cached[1], connection)
+
+    @classmethod
+    def fromConfig(cls, configFile, connection=None):
+        """
+        通过 .sumocfg 配置文件中的路网文件加载路网信息，见 fromNetFile。
+        :param configFile: SUMO 配置文件路径
+        :param connection: 缓存中没有某条车道时用于补查的 TraCI 连接，默认为 traci 的当前连接
+        """
+        return cls.fromNetFile(netFileFromConfig(configFile), connection)
+
+    @staticmethod
+    def _parseNetFile(netFile):
+        """
+        用 sumolib 解析路网文件。
+        :return: (车道长度, 车道所属道路, 车道通向的交叉口, 信号灯受控车道)
+        """
+        net = sumolib.net.readNet(netFile, withInternal=True)
+        laneLengths, laneEdges, laneJunctions = dict(), dict(), dict()
+        for edge in net.getEdges(withInternal=True):
+            edgeID = edge.getID()
+            junction = _internalJunction(edgeID) if edgeID.startswith(":") else edge.getToNode().getID()
+            for lane in edge.getLanes():
+                laneLengths[lane.getID()] = lane.getLength()
+                laneEdges[lane.getID()] = edgeID
+                laneJunctions[lane.getID()] = junction
+        controlledLanes = dict()
+        for tls in net.getTrafficLights():
+            # 受控车道按信号连接的下标排列
+            links = dict()
+            for inLane, _, linkIndex in tls.getConnections():
+                links.setdefault(linkIndex, inLane.getID())
+            controlledLanes[tls.getID()] = tuple(links[i] for i in sorted(links))
+        return laneLengths, laneEdges, laneJunctions, controlledLanes
+
+    def getLaneLength(self, lane):
+        """
+        获取车道长度。
+        :param lane: 车道 ID
+        """
+        length = self._laneLengths.get(lane)
+        if length is None:
+            length = self._laneLengths[lane] = self._traci.lane.getLength(lane)
+        return length
+
+    def getLaneEdge(self, lane):
+        """
+        获取车道所属的道路 ID。
+        :param lane: 车道 ID
+        """
+        edge = self._laneEdges.get(lane)
+        if edge is None:
+            edge = self._laneEdges[lane] = self._traci.lane.getEdgeID(lane)
+        return edge
+
+    def getLaneJunction(self, lane):
+        """
+        获取车道通向的交叉口 ID（内部车道返回其所在的交叉口）。
+        :param lane: 车道 ID
+        """
+        return self._laneJunctions.get(lane)
+
+    def getTrafficLightIDs(self):
+        """
+        获取所有信号灯 ID。
+        """
+        return list(self._controlledLanes)
+
+    def getControlledLanes(self, tls):
+        """
+        获取信号灯控制的车道（与 traci.trafficlight.getControlledLanes 的顺序一致）。
+        :param tls: 信号灯 ID
+        """
+        lanes = self._controlledLanes.get(tls)
+        if lanes is None:
+            lanes = self._controlledLanes[tls] = tuple(self._traci.trafficlight.getControlledLanes(tls))
+        return lanes
@@ -0,0 +1,95 @@
+import time
+from contextlib import nullcontext
+
+# 关闭计时时各阶段共用的空上下文
+_NULL_PHASE = nullcontext()
+
+
+class _Phase:
+    """一个计时阶段的上下文：记录单调时钟耗时和期间发送的 TraCI 命令数"""
+
+    __slots__ = ("_profiler", "_name", "_start", "_calls")
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._calls = self._profiler.traci_calls
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._start
+        profiler = self._profiler
+        profiler.times[self._name] = profiler.times.get(self._name, 0.0) + elapsed
+        profiler.calls[self._name] = profiler.calls.get(self._name, 0) + profiler.traci_calls - self._calls
+        return False
+
+
+class StepProfiler:
+    """
+    热点路径的分阶段计时：每个阶段的单调时钟耗时和 TraCI 命令数（通过包装连接的 _sendCmd 统计）。
+    关闭时 phase 返回共用的空上下文，几乎没有额外开销。
+    每步开始时调用 begin_step 清空上一步的结果，步结束后用 results 取出本步各阶段的耗时（毫秒）和命令数。
+    """
+
+    def __init__(self, enabled=True):
+        """
+        :param enabled: 是否启用计时
+        """
+        self.enabled = enabled
+        self.times = dict()  # 阶段 -> 本步累计耗时（秒）
+        self.calls = dict()  # 阶段 -> 本步发送的 TraCI 命令数
+        self.traci_calls = 0  # 已包装连接累计发送的 TraCI 命令数
+        self._phases = dict()  # 阶段名 -> 复用的 _Phase 对象
+
+    def attach(self, connection):
+        """
+        包装 TraCI 连接的 _sendCmd，统计发送的命令数。
+        libsumo 后端没有套接字通信，不统计命令数。
+        :param connection: TraCI 连接
+        """
+        send = getattr(connection, "_sendCmd", None)
+        if not self.enabled or send is None or getattr(send, "_profiler", None) is self:
+            return
+
+        def _sendCmd(*args, **kwargs):
+            self.traci_calls += 1
+            return send(*args, **kwargs)
+
+        _sendCmd._profiler = self
+        connection._sendCmd = _sendCmd
+
+    def phase(self, name):
+        """
+        返回计时阶段的上下文管理器，用法：with profiler.phase("observation"): ...
+        :param name: 阶段名
+        """
+        if not self.enabled:
+            return _NULL_PHASE
+        phase = self._phases.get(name)
+        if phase is None:
+            phase = self._phases[name] = _Phase(self, name)
+        return phase
+
+    def begin_step(self):
+        """清空上一步的结果"""
+        if self.enabled:
+            self.times.clear()
+            self.calls.clear()
+
+    def results(self):
+        """
+        本步各阶段的结果。
+        :return: {"<阶段>_ms": 耗时（毫秒）, "<阶段>_traci_calls": TraCI 命令数} 的字典，关闭时为空字典
+        """
+        results = dict()
+        for name, seconds in self.times.items():
+            results[f"{name}_ms"] = seconds * 1000
+            results[f"{name}_traci_calls"] = self.calls[name]
+        return results
+
+
+# 未启用计时时使用的共享实例
+NULL_PROFILER = StepProfiler(enabled=False)
@@ -0,0 +1,91 @@
+import numpy as np
+from backend import traci
+
+# 信号状态中表示绿灯的字符（G 为优先绿灯，g 为非优先绿灯）
+GREEN_STATES = "Gg"
+# 被保留的车队或车辆低于该距离（米）时直接停车，不再计算滑行速度
+STOP_DISTANCE = 1.0
+
+
+class ReservationEngine():
+    """
+    基于闭式运动学的交叉口预留计算。
+    每步只读取一次信号灯状态和剩余绿灯时间，然后用匀加速（到最大速度后匀速）模型一次性算出
+    所有排队车队或车辆的到达时间窗口，按顺序累积预留时间，并以数组形式返回放行/保留的判定和目标速度。
+    """
+
+    def __init__(self, intersection, controlledLanes, a_max=2.0):
+        """
+        初始化预留计算。
+        :param intersection: 信号灯（交叉口）ID
+        :param controlledLanes: 按信号连接下标排列的受控车道（traci.trafficlight.getControlledLanes 的结果）
+        :param a_max: 最大允许加速度
+        """
+        self.intersection = intersection
+        self.controlledLanes = tuple(controlledLanes)
+        self.a_max = a_max
+        self.greenLanes = frozenset()  # 当前有绿灯信号连接的车道
+        self.remainingGreen = 0.0  # 当前相位到下次切换的剩余时间
+
+    def readSignal(self):
+        """
+        读取信号灯当前状态和到下次切换的剩余时间，每步调用一次。
+        """
+        state = traci.trafficlight.getRedYellowGreenState(self.intersection)
+        remaining = traci.trafficlight.getNextSwitch(self.intersection) - traci.simulation.getTime()
+        self.greenLanes = frozenset(lane for lane, signal in zip(self.controlledLanes, state) if signal in GREEN_STATES)
+        self.remainingGreen = max(remaining, 0.0)
+
+    def arrivalTimes(self, distance, speed, maxSpeed):
+        """
+        以最大加速度加速到最大速度后匀速行驶时，到达停车线的时间。
+        :param distance: 到停车线的距离数组
+        :param speed: 当前速度数组
+        :param maxSpeed: 最大速度数组
+        :return: 到达时间数组
+        """
+        a = self.a_max
+        accelerationTime = np.maximum(maxSpeed - speed, 0) / a
+        accelerationDistance = speed * accelerationTime + 0.5 * a * accelerationTime ** 2
+        # 在加速阶段内到达：d = v t + a t^2 / 2 的正根
+        whileAccelerating = (np.sqrt(speed ** 2 + 2 * a * distance) - speed) / a
+        afterAccelerating = accelerationTime + (distance - accelerationDistance) / np.maximum(maxSpeed, 1e-6)
+        return np.where(distance <= accelerationDistance, whileAccelerating, afterAccelerating)
+
+    def plan(self, queue, distances, reservedTime=0):
+        """
+        为按通行顺序排列的车队或车辆计算预留时间、放行判定和目标速度。
+        :param queue: 车队或车辆列表（需提供 getLane、getSpeed、getMaxSpeed 和 getLength）
+        :param distances: 每个车队或车辆到停车线的距离（与 queue 对应）
+        :param reservedTime: 已经预留的时间
+        :return: (是否放行的布尔数组, 目标速度数组, 新的预留时间)
+        """
+        n = len(queue)
+        if n == 0:
+            return np.zeros(0, dtype=bool), np.zeros(0), reservedTime
+        distance = np.asarray(distances, dtype=np.float64)
+        speed = np.fromiter((pv.getSpeed() for pv in queue), dtype=np.float64, count=n)
+        maxSpeed = np.fromiter((pv.getMaxSpeed() for pv in queue), dtype=np.float64, count=n)
+        length = np.fromiter((pv.getLength() for pv in queue), dtype=np.float64, count=n)
+        green = np.fromiter((pv.getLane() in self.greenLanes for pv in queue), dtype=bool, count=n)
+
+        arrival = self.arrivalTimes(distance, speed, maxSpeed)
+        # 以最大速度完全通过停车线所需的时间
+        clearing = length / np.maximum(maxSpeed, 1e-6)
+
+        # 预留时间的递推 r_i = max(arrival_i, r_{i-1}) + clearing_i 写成前缀最大值：
+        # r_i - C_i = max(r_0, max_{k<=i}(arrival_k - C_{k-1}))，C 为 clearing 的前缀和
+        cumulative = np.cumsum(clearing)
+        previous = cumulative - clearing
+        reserved = np.maximum(np.maximum.accumulate(arrival - previous), reservedTime) + cumulative
+        start = reserved - clearing
+
+        # 所在车道为绿灯且预留时间窗口在剩余绿灯时间内结束时放行
+        admit = green & (reserved <= self.remainingGreen)
+
+        # 被保留的车队或车辆：减速到恰好在其预留开始时（红灯时不早于下次切换）到达停车线
+        earliest = np.where(green, start, np.maximum(start, self.remainingGreen))
+        holdSpeed = np.clip(distance / np.maximum(earliest, 1e-6), 0, maxSpeed)
+        holdSpeed[distance < STOP_DISTANCE] = 0
+        speeds = np.where(admit, maxSpeed, holdSpeed)
+        return admit, speeds, float(reserved[-1])
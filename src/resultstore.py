@@ -0,0 +1,72 @@
+import sqlite3
+
+import pandas as pd
+
+
+def _quote(name):
+    """将列名转为 SQLite 标识符（列名中可能包含空格、括号和非 ASCII 字符）"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+class ResultStore:
+    """
+    基于 SQLite 的只追加结果存储，每个 episode 追加一行，不再读取和重写整个 Excel 文件。
+    使用 WAL 模式和写锁等待超时，多个并行评估进程可以各自打开同一个数据库文件并发写入。
+    列在第一次出现时自动添加，评估结束后可用 export_excel 导出为 Excel。
+    """
+
+    def __init__(self, db_file, table="results", timeout=60.0):
+        """
+        :param db_file: SQLite 数据库文件路径
+        :param table: 结果表名
+        :param timeout: 等待其他进程释放写锁的秒数
+        """
+        self.db_file = db_file
+        self.table = table
+        # 由 append 显式开启事务
+        self.conn = sqlite3.connect(db_file, timeout=timeout, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {_quote(table)} (_row INTEGER PRIMARY KEY AUTOINCREMENT)")
+
+    def _columns(self):
+        return {row[1] for row in self.conn.execute(f"PRAGMA table_info({_quote(self.table)})")}
+
+    def append(self, record):
+        """
+        追加一行结果。
+        :param record: 列名 -> 值的字典
+        """
+        names = list(record)
+        # BEGIN IMMEDIATE 先取得写锁，保证补列和插入之间不会被其他进程打断
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = self._columns()
+            for name in names:
+                if name not in existing:
+                    self.conn.execute(f"ALTER TABLE {_quote(self.table)} ADD COLUMN {_quote(name)}")
+            self.conn.execute(
+                f"INSERT INTO {_quote(self.table)} ({', '.join(_quote(n) for n in names)}) "
+                f"VALUES ({', '.join('?' for _ in names)})",
+                [record[n] for n in names])
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def to_dataframe(self):
+        """按追加顺序读取所有结果"""
+        df = pd.read_sql_query(f"SELECT * FROM {_quote(self.table)} ORDER BY _row", self.conn)
+        return df.drop(columns="_row")
+
+    def export_excel(self, excel_file, sheet_name="Results"):
+        """
+        将所有结果导出为 Excel 文件（只在评估结束时调用一次）。
+        :param excel_file: Excel 文件路径
+        :param sheet_name: 工作表名
+        """
+        # 使用 openpyxl 以支持 Excel 格式
+        with pd.ExcelWriter(excel_file, engine='openpyxl', mode='w') as writer:
+            self.to_dataframe().to_excel(writer, sheet_name=sheet_name, index=False)
+
+    def close(self):
+        self.conn.close()
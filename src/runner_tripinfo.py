@@ -1,16 +1,20 @@
 import numpy as np
-import traci
+from backend import traci
 from sumo_env import SumoEnvWithPlatoon
-from stable_baselines3 import PPO
-import os
-import sumolib
-import pandas as pd
+from inference import NumpyPolicy
+from tripinfo import TripinfoAggregator
+from resultstore import ResultStore
 
-# 加载训练好的 PPO 模型
-model = PPO.load("../model/PPO_MODEL.zip")
+# 加载训练好的 PPO 模型，策略网络用 NumPy 前向计算，避免每步的 PyTorch 调度开销
+model = NumpyPolicy.load("../model/PPO_MODEL.zip")
+
+# tripinfo 输出文件，仿真过程中增量读取
+emissions_file = "../output/tripinfo.xml"
 
 # 初始化 SUMO 环境
-env = SumoEnvWithPlatoon(config_file="../maps/s.sumocfg", use_gui=False)
+env = SumoEnvWithPlatoon(config_file="../maps/s.sumocfg", use_gui=False, tripinfo_file=emissions_file)
+# 流式统计 tripinfo，内存占用与文件大小无关
+tripinfo = TripinfoAggregator(emissions_file)
 # 用于存储每个 episode 的交通数据
 episode_travel_times = []
 episode_fuel_consumptions = []
@@ -19,35 +23,30 @@ episode_tripinfo_delays = []  # 基于 tripinfo 文件中的 timeLoss 计算的
 episode_passed_vehicles = []  # 存储每个 episode 通过交叉口的车辆数量
 
 
-def save_results_to_excel(excel_file, episode, episode_reward, avg_travel_time, avg_delay_tripinfo, avg_fuel_consumption, avg_co2_emission, passed_vehicle_count):
+# 每个 episode 追加一行结果，评估结束后统一导出为 Excel
+results = ResultStore("../output/results.sqlite")
+excel_file = "../output/results.xlsx"
+
+
+def save_results(episode, episode_reward, avg_travel_time, avg_delay_tripinfo, avg_fuel_consumption, avg_co2_emission, passed_vehicle_count):
     """
-    保存仿真结果到 Excel 文件
+    追加一个 episode 的仿真结果
     """
-    data = {
-        'Episode': [episode],
-        'Avg Travel Time (s)': [avg_travel_time],
-        'Avg Delay (s)': [avg_delay_tripinfo],
-        'Avg Fuel Consumption (L/100km)': [avg_fuel_consumption],
-        'Avg CO₂ Emission (g/km)': [avg_co2_emission],
-        'Passed Vehicles': [passed_vehicle_count]
-    }
-
-    # 检查 Excel 文件是否存在
-    if os.path.exists(excel_file):
-        df = pd.read_excel(excel_file, sheet_name="Results")
-        df = pd.concat([df, pd.DataFrame(data)], ignore_index=True)
-    else:
-        df = pd.DataFrame(data)
-
-    # 使用 openpyxl 以支持 Excel 格式
-    with pd.ExcelWriter(excel_file, engine='openpyxl', mode='w') as writer:
-        df.to_excel(writer, sheet_name="Results", index=False)
+    results.append({
+        'Episode': episode,
+        'Avg Travel Time (s)': avg_travel_time,
+        'Avg Delay (s)': avg_delay_tripinfo,
+        'Avg Fuel Consumption (L/100km)': avg_fuel_consumption,
+        'Avg CO₂ Emission (g/km)': avg_co2_emission,
+        'Passed Vehicles': passed_vehicle_count
+    })
 
 
 # 运行多个 episode 来验证模型效果
 num_episodes = 1
 for episode in range(num_episodes):
     obs = env.reset()
+    tripinfo.reset()  # 每个 episode 重新写出 tripinfo 文件
     done = False
     episode_reward = 0
 
@@ -73,39 +72,23 @@ for episode in range(num_episodes):
         obs, reward, done, info = env.step(action)
         episode_reward += reward
 
+        # 有车辆到达时读取 tripinfo 中新写出的行程
+        if env.vehicle_state.getArrivedIDs():
+            tripinfo.poll()
+
         # 统计已通过交叉口的车辆
 
 
     # 结束当前 episode 后，关闭 SUMO 环境，确保输出文件写入完成
     env.close()
 
-    # 使用 sumolib 解析 tripinfo.xml 统计 Travel Time、油耗、CO₂排放及延误
-    emissions_file = "../output/tripinfo.xml"
-    fuel_sum, co2_sum, delay_sum, travel_time_sum, trip_count = 0, 0, 0, 0, 0
-    if os.path.exists(emissions_file):
-        for trip in sumolib.output.parse(emissions_file, ['tripinfo']):
-            # 解析排放数据
-
-
-
-
-            # 从 tripinfo 读取 Travel Time（行程时间）
-            try:
-                travel_time = float(getattr(trip, 'duration', 0))
-            except Exception:
-                travel_time = 0
-            travel_time_sum += travel_time
-
-            # 使用 tripinfo 中的 timeLoss 作为延误指标
-            try:
-                trip_delay = float(getattr(trip, 'timeLoss', 0))
-            except Exception:
-                trip_delay = 0
-            delay_sum += trip_delay
-
-            trip_count += 1
-
-
+    # 读取关闭时写出的剩余行程，统计 Travel Time、油耗、CO₂排放及延误（timeLoss）
+    tripinfo.poll()
+    summary = tripinfo.summary()
+    avg_travel_time = summary['avg_travel_time']
+    avg_delay_tripinfo = summary['avg_delay']
+    avg_fuel_consumption = summary['avg_fuel_consumption']
+    avg_co2_emission = summary['avg_co2_emission']
 
     # 存储当前 episode 的数据
     episode_travel_times.append(avg_travel_time)
@@ -122,9 +105,12 @@ for episode in range(num_episodes):
     print(f"  Avg CO₂ Emission: {avg_co2_emission:.2f} g/km")
     print(f"  Passed Vehicles: {len(passed_vehicles)}")
 
-    # 保存结果到 Excel 文件
-    excel_file = "../output/results.xlsx"
-    save_results_to_excel(excel_file, episode + 1, episode_reward, avg_travel_time, avg_delay_tripinfo, avg_fuel_consumption, avg_co2_emission, len(passed_vehicles))
+    # 保存结果
+    save_results(episode + 1, episode_reward, avg_travel_time, avg_delay_tripinfo, avg_fuel_consumption, avg_co2_emission, len(passed_vehicles))
+
+# 导出所有结果到 Excel 文件
+results.export_excel(excel_file)
+results.close()
 
 # 输出所有 episode 的平均数据
 print("\nSummary of all episodes:")
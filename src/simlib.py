@@ -1,9 +1,35 @@
 # 导入logging模块，用于记录程序运行过程中的信息，方便调试和监控
 import logging
-# 导入traci模块，它是SUMO（Simulation of Urban MObility）的一个接口，用于与SUMO仿真环境进行交互
-import traci
-# 从sumolib模块中导入checkBinary函数，该函数用于检查SUMO相关的二进制可执行文件是否可用
-from sumolib import checkBinary
+# 导入backend模块，它根据SUMO_BACKEND环境变量选择与SUMO仿真环境交互的方式（libsumo、traci或sumo-gui）
+import backend
+# 导入NetworkCache类，用于从路网文件加载静态路网信息
+from netcache import NetworkCache
+
+# 批量运行时对setUpSimulation参数的覆盖设置，由configureRun设置
+# 可以覆盖的键：gui、trafficScale、logLevel、seed（SUMO随机数种子）、outputPrefix（所有输出文件的路径前缀）、
+# extraArgs（追加到SUMO命令行的其他参数列表）
+_runOverrides = dict()
+
+# setUpSimulation最近一次启动的仿真所使用的配置文件，getNetwork据此加载路网信息
+_currentConfigFile = None
+
+def configureRun(**overrides):
+    # 定义一个名为configureRun的函数，用于在调用runScenario之前设置之后启动的仿真所使用的参数
+    # runScenario内部调用setUpSimulation时无法传入这些参数，批量运行时由每个工作进程在运行前设置
+    # 不传入任何参数时清除之前的覆盖设置
+    unknown = set(overrides) - {"gui", "trafficScale", "logLevel", "seed", "outputPrefix", "extraArgs"}
+    if unknown:
+        raise ValueError("Unknown run overrides: %s" % ", ".join(sorted(unknown)))
+    _runOverrides.clear()
+    _runOverrides.update(overrides)
+
+def getNetwork():
+    # 定义一个名为getNetwork的函数，用于获取setUpSimulation启动的仿真的静态路网信息缓存（NetworkCache）
+    # 路网信息从配置文件中的路网文件加载，每个路网文件在同一进程中只解析一次
+    # 没有通过setUpSimulation启动仿真时，退回到通过TraCI逐车道查询
+    if _currentConfigFile is None:
+        return NetworkCache.fromTraCI()
+    return NetworkCache.fromConfig(_currentConfigFile)
 
 def flatten(l):
     # 定义一个名为flatten的函数，它接受一个列表l作为参数
@@ -11,26 +37,35 @@ def flatten(l):
     # 具体实现是使用列表推导式，遍历嵌套列表中的每个子列表，再遍历子列表中的每个元素并添加到新列表中
     return [item for sublist in l for item in sublist]
 
-def setUpSimulation(configFile, trafficScale = 1, outputFileLocation="output/additional.xml"):
+def setUpSimulation(configFile, trafficScale = 1, outputFileLocation="output/additional.xml", gui=None,
+                    logLevel=logging.INFO):
     # 定义一个名为setUpSimulation的函数，用于设置并启动SUMO仿真
     # configFile是SUMO的配置文件路径，是必传参数
     # trafficScale是交通流量的缩放比例，默认为1
     # outputFileLocation是额外输出文件的位置，默认为"output/additional.xml"
+    # gui表示是否使用图形化界面，默认为None时由SUMO_BACKEND决定（只有gui后端使用图形化界面），
+    # 显式传入True或False时覆盖后端的选择（libsumo后端不支持图形化界面，总是无界面运行）
+    # logLevel是根日志记录器的日志级别，默认为INFO（交叉口的逐步状态由遥测记录器记录，不再输出DEBUG日志）
+
+    # 使用configureRun设置的覆盖参数
+    gui = _runOverrides.get("gui", gui)
+    trafficScale = _runOverrides.get("trafficScale", trafficScale)
+    logLevel = _runOverrides.get("logLevel", logLevel)
 
-    # 调用checkBinary函数检查sumo-gui这个可执行文件是否可用，并将结果赋值给sumoBinary变量
-    # sumo-gui是SUMO的图形化界面版本
-    sumoBinary = checkBinary("sumo-gui")
+    # 获取要启动的SUMO可执行文件，并将结果赋值给sumoBinary变量
+    # sumo-gui是SUMO的图形化界面版本，sumo是无界面版本
+    sumoBinary = backend.sumo_binary(gui)
 
     # 配置日志记录的格式，使用当前时间和日志信息组合的格式
     # 这样在记录日志时，每条日志前都会显示记录的时间
     logging.basicConfig(format='%(asctime)s %(message)s')
     # 获取根日志记录器
     root = logging.getLogger()
-    # 设置根日志记录器的日志级别为DEBUG
-    # 这样可以记录包括调试信息在内的所有级别的日志
-    root.setLevel(logging.DEBUG)
+    # 设置根日志记录器的日志级别
+    # 需要调试信息时可以传入logging.DEBUG，记录包括调试信息在内的所有级别的日志
+    root.setLevel(logLevel)
 
-    # 使用traci.start函数启动SUMO仿真
+    # 使用backend.start函数启动SUMO仿真
     # 传入的参数是一个列表，包含了启动SUMO所需的各种配置信息
     # sumoBinary指定使用的SUMO可执行文件
     # "-c"表示指定配置文件，后面跟着configFile变量的值
@@ -40,5 +75,16 @@ def setUpSimulation(configFile, trafficScale = 1, outputFileLocation="output/add
     # "--additional-files"指定额外的输出文件位置
     # "--duration-log.statistics"表示记录仿真的持续时间统计信息
     # "--scale"指定交通流量的缩放比例，将其转换为字符串传入
-    traci.start([sumoBinary, "-c", configFile, "--step-length", "0.1", "--collision.action", "none", "--start",
-                 "--additional-files", outputFileLocation, "--duration-log.statistics", "--scale", str(trafficScale)])
\ No newline at end of file
+    sumoCmd = [sumoBinary, "-c", configFile, "--step-length", "0.1", "--collision.action", "none", "--start",
+               "--additional-files", outputFileLocation, "--duration-log.statistics", "--scale", str(trafficScale)]
+    # "--seed"指定SUMO的随机数种子
+    if _runOverrides.get("seed") is not None:
+        sumoCmd += ["--seed", str(_runOverrides["seed"])]
+    # "--output-prefix"为所有输出文件（包括额外文件中定义的检测器输出）加上路径前缀，使每次运行的输出互不覆盖
+    if _runOverrides.get("outputPrefix"):
+        sumoCmd += ["--output-prefix", _runOverrides["outputPrefix"]]
+    sumoCmd += list(_runOverrides.get("extraArgs", ()))
+    backend.start(sumoCmd)
+    # 记录配置文件，之后创建的SimulationManager通过getNetwork从路网文件加载路网信息
+    global _currentConfigFile
+    _currentConfigFile = configFile
\ No newline at end of file
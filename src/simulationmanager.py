@@ -1,16 +1,22 @@
 from intersectionController import IntersectionController
 from platoon import Platoon
-from vehicle import Vehicle
-from simlib import flatten
+from vehicle import Vehicle, RouteCache
+from vehiclestate import VehicleStateCache
+from vehiclestore import VehicleArrayStore
+from commandbuffer import CommandBuffer
+from cacc import PlatoonConsensusEngine
+from profiling import NULL_PROFILER
+from simlib import flatten, getNetwork
 
-import traci
+from collections import defaultdict
 
 class SimulationManager():
     """
     模拟管理器类，用于管理交通模拟中的各种元素，如交叉口、车队和车辆等。
     """
 
-    def __init__(self, pCreation=True, iCoordination=True, iZipping=True, maxVehiclesPerPlatoon=0):
+    def __init__(self, pCreation=True, iCoordination=True, iZipping=True, maxVehiclesPerPlatoon=0, stateCache=None,
+                 consensusControl=False, network=None, telemetry=None, profiler=None):
         """
         初始化模拟管理器。
 
@@ -19,6 +25,12 @@ class SimulationManager():
             iCoordination (bool): 是否进行交叉口协调，默认为True。
             iZipping (bool): 是否启用交织功能，默认为True。
             maxVehiclesPerPlatoon (int): 每个车队的最大车辆数，默认为0。
+            stateCache (VehicleStateCache): 共享的车辆状态快照，默认为None时自行创建。
+            consensusControl (bool): 是否用车队级 CACC 一致性控制跟随车辆的速度，默认为False。
+            network (NetworkCache): 静态路网信息缓存，默认为None时由 simlib.getNetwork 从当前仿真的路网文件加载
+                （每个路网文件只解析一次）。
+            telemetry (TelemetryRecorder): 交叉口状态的遥测记录器，默认为None时不记录。
+            profiler (StepProfiler): 分阶段计时器，默认为None时不计时。
         """
         self.intersections = []  # 存储所有交叉口控制器的列表
         self.platoons = list()  # 存储所有车队的列表
@@ -26,11 +38,39 @@ class SimulationManager():
         self.vehicles = list()  # 存储所有车辆的列表
         self.maxStoppedVehicles = dict()  # 存储每个车道上最多停止车辆数的字典
         self.maxVehiclesPerPlatoon = maxVehiclesPerPlatoon  # 每个车队的最大车辆数
+        # 每步刷新一次的车辆状态快照，所有车辆共享
+        self.stateCache = stateCache if stateCache is not None else VehicleStateCache()
+        self.vehicleStore = VehicleArrayStore()  # 所有车辆位置、速度和加速度的结构数组存储
+        self.routeCache = RouteCache()  # 本次仿真中车辆共享的路线，车辆离开路网时释放
+        self.commandBuffer = CommandBuffer()  # 车辆设置命令的缓冲区，每步结束时统一发送
+        # 车队级 CACC 一致性控制器（不启用时为None）
+        self.consensusEngine = PlatoonConsensusEngine(self.vehicleStore, self.stateCache) if consensusControl else None
+        # 车队索引，随车队的创建、合并、解散和换道增量维护，使查询为 O(1)
+        self._activePlatoons = dict()  # 活跃车队（按创建顺序的有序集合，值为 None）
+        self._platoonByVehicle = dict()  # 车辆名称 -> 所在的活跃车队
+        self._platoonsByLane = defaultdict(dict)  # 车道 -> 该车道上的活跃车队（有序集合）
+        self._indexedLane = dict()  # 车队 -> 索引中记录的车道
+        self._indexedMembers = dict()  # 车队 -> 索引中记录的成员车辆名称
+        # 已从 self.platoons 中清理掉的车队的累计统计，用于计算所有车队的平均长度
+        self._retiredPlatoonCount = 0  # 已清理且计入平均长度的车队数
+        self._retiredVehicleCount = 0  # 这些车队的车辆总数
+        self.telemetry = telemetry  # 交叉口状态的遥测记录器（TelemetryRecorder）
+        self.profiler = profiler if profiler is not None else NULL_PROFILER  # 分阶段计时器（StepProfiler）
+        # 车道长度、车道所属道路和信号灯受控车道等静态路网信息，只加载一次
+        self.network = network if network is not None else getNetwork()
         if iCoordination:
             # 如果需要进行交叉口协调，则为每个交通灯创建一个交叉口控制器并添加到列表中
-            for intersection in traci.trafficlight.getIDList():
-                controller = IntersectionController(intersection, iZipping)
+            for intersection in self.network.getTrafficLightIDs():
+                controller = IntersectionController(intersection, iZipping, network=self.network,
+                                                    telemetry=telemetry)
                 self.intersections.append(controller)
+        # 车道 -> 服务该车道的交叉口控制器，车队按当前车道直接找到关心它的控制器
+        self._controllersByLane = defaultdict(list)
+        for controller in self.intersections:
+            for lane in controller.lanesServed:
+                self._controllersByLane[lane].append(controller)
+        # 每个交叉口控制器的计时阶段名
+        self._intersectionPhases = [f"intersection_{controller.name}" for controller in self.intersections]
 
     def createPlatoon(self, vehicles):
         """
@@ -42,6 +82,103 @@ class SimulationManager():
         # 创建一个新的车队，最大车辆数为self.maxVehiclesPerPlatoon
         platoon = Platoon(vehicles, maxVehicles=self.maxVehiclesPerPlatoon)
         self.platoons.append(platoon)  # 将新创建的车队添加到车队列表中
+        self.updatePlatoonIndex(platoon)  # 将新车队加入索引
+
+    def updatePlatoonIndex(self, platoon):
+        """
+        同步单个车队在索引中的记录。
+        车队被创建、合并、解散或换道后调用；handleSimulationStep 每步也会为所有活跃车队调用一次。
+
+        Args:
+            platoon (Platoon): 需要同步的车队。
+        """
+        if not platoon.isActive():
+            self._routePlatoon(platoon, self._indexedLane.get(platoon), None)
+            self._unindexPlatoon(platoon)
+            return
+        self._activePlatoons[platoon] = None
+
+        members = tuple(platoon.getAllVehiclesByName())
+        oldMembers = self._indexedMembers.get(platoon, ())
+        membersChanged = members != oldMembers
+        if membersChanged:
+            for v in oldMembers:
+                if self._platoonByVehicle.get(v) is platoon:
+                    del self._platoonByVehicle[v]
+            for v in members:
+                self._platoonByVehicle[v] = platoon
+            self._indexedMembers[platoon] = members
+
+        lane = platoon.getLane()
+        oldLane = self._indexedLane.get(platoon)
+        if lane != oldLane:
+            if oldLane is not None:
+                self._removeFromLane(platoon, oldLane)
+            self._platoonsByLane[lane][platoon] = None
+            self._indexedLane[platoon] = lane
+            self._routePlatoon(platoon, oldLane, lane)
+        if membersChanged or lane != oldLane:
+            # 通知仍在服务该车道的控制器，使其重建“压缩”组合
+            for controller in self._controllersByLane.get(lane, ()):
+                controller.platoonChanged(platoon)
+
+    def _routePlatoon(self, platoon, oldLane, newLane):
+        """
+        车队换道（或解散）时，通知进入和离开服务车道的交叉口控制器。
+        只有车队进入或离开控制器的服务车道时，控制器的车队列表才会变化。
+
+        Args:
+            platoon (Platoon): 车队对象。
+            oldLane (str): 车队原来所在的车道，新车队为None。
+            newLane (str): 车队现在所在的车道，解散的车队为None。
+        """
+        oldControllers = self._controllersByLane.get(oldLane, ())
+        newControllers = self._controllersByLane.get(newLane, ())
+        for controller in oldControllers:
+            if controller not in newControllers and platoon in controller.platoons:
+                controller.removePlatoon(platoon)
+        for controller in newControllers:
+            if controller not in oldControllers:
+                controller.addPlatoon(platoon)
+
+    def _unindexPlatoon(self, platoon):
+        """
+        将车队从索引中移除。
+
+        Args:
+            platoon (Platoon): 需要移除的车队。
+        """
+        self._activePlatoons.pop(platoon, None)
+        for v in self._indexedMembers.pop(platoon, ()):
+            if self._platoonByVehicle.get(v) is platoon:
+                del self._platoonByVehicle[v]
+        lane = self._indexedLane.pop(platoon, None)
+        if lane is not None:
+            self._removeFromLane(platoon, lane)
+
+    def _removeFromLane(self, platoon, lane):
+        """
+        将车队从车道索引中移除，车道上没有车队时删除该车道的记录。
+        """
+        platoons = self._platoonsByLane[lane]
+        platoons.pop(platoon, None)
+        if not platoons:
+            del self._platoonsByLane[lane]
+
+    def createVehicle(self, vehicleID):
+        """
+        创建一个读取共享状态快照的车辆对象，并加入车辆列表。
+
+        Args:
+            vehicleID (str): 车辆名称。
+
+        Returns:
+            Vehicle: 新创建的车辆对象。
+        """
+        vehicle = Vehicle(vehicleID, stateCache=self.stateCache, store=self.vehicleStore,
+                          commandBuffer=self.commandBuffer, network=self.network, routeCache=self.routeCache)
+        self.vehicles.append(vehicle)
+        return vehicle
 
     def getActivePlatoons(self):
         """
@@ -50,8 +187,8 @@ class SimulationManager():
         Returns:
             list: 活跃车队的列表。
         """
-        # 过滤出所有活跃的车队
-        return [p for p in self.platoons if p.isActive()]
+        # 从索引中取出活跃车队（同一步内刚解散、尚未同步的车队同样被过滤掉）
+        return [p for p in self._activePlatoons if p.isActive()]
 
     def getAllVehiclesInPlatoons(self):
         """
@@ -70,16 +207,56 @@ class SimulationManager():
         Returns:
             float: 所有车队的平均长度。
         """
-        if self.platoons:  # 如果存在车队
-            count = 0  # 用于累加车队中车辆的总数
-            length = len(self.platoons)  # 车队的数量
+        # 已清理的车队以累计值计入
+        count = self._retiredVehicleCount  # 用于累加车队中车辆的总数
+        length = self._retiredPlatoonCount  # 车队的数量
+        for platoon in self.platoons:
+            if self._countsTowardsAverageLength(platoon):
+                count = count + platoon.getNumberOfVehicles()  # 累加该车队的车辆数
+                length = length + 1
+        if length:  # 如果存在车队
+            return count/length  # 计算平均长度
+
+    def _countsTowardsAverageLength(self, platoon):
+        """
+        判断车队是否计入平均长度：因合并或更换领头车辆而重组解散的车队不计入。
+
+        Args:
+            platoon (Platoon): 车队对象。
+
+        Returns:
+            bool: 是否计入平均长度。
+        """
+        # 如果车队的解散原因不是“Merged”和“Reform required due to new leader”
+        return platoon._disbandReason != "Merged" and platoon._disbandReason != "Reform required due to new leader"
+
+    def _collectGarbage(self):
+        """
+        清理已解散的车队和已离开路网的车辆，使 self.platoons 和 self.vehicles 只保留仍在使用的对象。
+        被清理车队的统计值累加到平均长度的累计值中，结果与保留全部车队时相同。
+        """
+        if any(not p.isActive() for p in self.platoons):
+            remaining = []
             for platoon in self.platoons:
-                # 如果车队的解散原因不是“Merged”和“Reform required due to new leader”
-                if platoon._disbandReason != "Merged" and platoon._disbandReason != "Reform required due to new leader":
-                    count = count + platoon.getNumberOfVehicles()  # 累加该车队的车辆数
+                if platoon.isActive():
+                    remaining.append(platoon)
+                elif self._countsTowardsAverageLength(platoon):
+                    self._retiredPlatoonCount += 1
+                    self._retiredVehicleCount += platoon.getNumberOfVehicles()
+            self.platoons = remaining
+
+        arrived = self.stateCache.getArrivedIDs()
+        if arrived:
+            arrived = set(arrived)
+            remaining = []
+            for vehicle in self.vehicles:
+                if vehicle.getName() in arrived:
+                    vehicle.setInActive()  # 已离开路网的车辆不再发送 TraCI 命令
+                    vehicle.detachStore()  # 释放其在结构数组存储中的槽位
+                    vehicle.releaseRoute()  # 释放其在共享路线缓存中的引用
                 else:
-                    length = length - 1  # 排除不符合条件的车队
-            return count/length  # 计算平均长度
+                    remaining.append(vehicle)
+            self.vehicles = remaining
 
     def getPlatoonByLane(self, lane):
         """
@@ -91,8 +268,8 @@ class SimulationManager():
         Returns:
             list: 指定车道上的车队列表。
         """
-        # 过滤出所有活跃车队中位于指定车道的车队
-        return [p for p in self.getActivePlatoons() if lane == p.getLane()]
+        # 从车道索引中取出位于指定车道的活跃车队
+        return [p for p in self._platoonsByLane.get(lane, ()) if p.isActive()]
 
     def getPlatoonByVehicle(self, v):
         """
@@ -104,7 +281,9 @@ class SimulationManager():
         Returns:
             list: 包含指定车辆的车队列表。
         """
-        return [p for p in self.getActivePlatoons() if v in p.getAllVehiclesByName()]
+        # 从车辆索引中取出车辆所在的车队
+        platoon = self._platoonByVehicle.get(v)
+        return [platoon] if platoon is not None and platoon.isActive() else []
 
     def getReleventPlatoon(self, vehicle):
         """
@@ -123,4 +302,39 @@ class SimulationManager():
         """
         处理模拟的单个步骤。
         """
+        # 每步先刷新一次车辆状态快照，之后车队和交叉口控制器通过 Vehicle 的 getter 读取快照
+        self.stateCache.update()
+        if self.telemetry is not None:
+            self.telemetry.beginStep(self.stateCache.step, self.stateCache.getTime())
+        # 车辆在上一步仿真中移动后车队可能已换道或解散，先同步索引再进行车队查询
+        for platoon in list(self._activePlatoons):
+            self.updatePlatoonIndex(platoon)
+        self._collectGarbage()
+
+        profiler = self.profiler
+        if self.consensusEngine:
+            # 一次计算所有车队跟随车辆的加速度和速度
+            # 先于交叉口控制器运行：命令缓冲区只保留同一车辆的最后一次设置，交叉口的停车或限速命令覆盖 CACC 的目标速度
+            with profiler.phase("consensus"):
+                self.consensusEngine.update(self.getActivePlatoons())
+
+        # 控制器的车队列表已由车道索引维护，这里只更新各交叉口
+        for intersection, phase in zip(self.intersections, self._intersectionPhases):
+            with profiler.phase(phase):
+                intersection.update()
+
+        # 本步车队和交叉口逻辑产生的设置命令在下一次仿真步之前统一发送（同一车辆同一属性只发送最后的值）
+        with profiler.phase("command_flush"):
+            self.commandBuffer.flush()
+
+    def flushCommands(self):
+        """
+        立即发送命令缓冲区中的命令。
+        handleSimulationStep 结束时会自动发送；在仿真步循环之外设置车辆（如创建车队后设置速度或换道）
+        且需要在下一次仿真步中生效时调用。
+
+        Returns:
+            int: 本次发送的命令数。
+        """
+        return self.commandBuffer.flush()
 
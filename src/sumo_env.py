@@ -1,55 +1,148 @@
+import itertools
+import os
+import tempfile
+
 import gym
 import numpy as np
-import traci
+import backend
+from backend import tc, FatalTraCIError
 from gym import spaces
 from simulationmanager import SimulationManager
+from vehiclestate import VehicleStateCache
+from netcache import NetworkCache
+from profiling import StepProfiler
 from scenario_manager import SCENARIO_NUMBER_CONFIGS
 
+# 每条受控车道订阅的观测变量：车辆数、平均速度、排队车辆数
+LANE_VARS = (tc.LAST_STEP_VEHICLE_NUMBER, tc.LAST_STEP_MEAN_SPEED, tc.LAST_STEP_VEHICLE_HALTING_NUMBER)
+# 信号灯订阅的观测变量：信号状态、相位时长、下次切换时间
+TLS_VARS = (tc.TL_RED_YELLOW_GREEN_STATE, tc.TL_PHASE_DURATION, tc.TL_NEXT_SWITCH)
+# 观测向量长度
+OBS_SIZE = 20
+# 每个交叉口观测中除车道指标外的特征数：信号状态、剩余时间、平均等待时间、平均速度
+JUNCTION_FEATURES = 4
+
+# reset 的方式：restart 每次重启 SUMO 进程；load 通过 traci.load 在原进程中重新加载仿真；
+# state 在原进程中载入第一次启动时保存的预热状态（traci.simulation.saveState / loadState）
+# 注意：state 方式不会重新打开 SUMO 的输出文件，tripinfo 等输出会跨 episode 连续写入同一个文件，
+# 且载入状态后仿真时间回到预热结束时，无法按时间区分各 episode 的记录；需要逐 episode 的统计时请使用 load 方式
+RESET_MODES = ("restart", "load", "state")
+
+# 同一进程内自动生成连接标签用的计数器
+_connection_counter = itertools.count()
+
 
 class SumoEnvWithPlatoon(gym.Env):
-    def __init__(self, config_file, max_steps=3600, use_gui=False, scenario_num=1,
-                 tripinfo_file=None):
+    def __init__(self, config_file, max_steps=3600, use_gui=None, scenario_num=1,
+                 tripinfo_file=None, label=None, port=None, reset_mode="restart", warmup_steps=0,
+                 multi_junction=False, seed=None, telemetry=None, profile=False):
         super(SumoEnvWithPlatoon, self).__init__()
         self.config_file = config_file  # SUMO 配置文件路径
         self.max_steps = max_steps  # 每个 episode 的最大步数
         self.current_step = 0  # 当前步数计数
-        self.use_gui = use_gui  # 是否使用 GUI 模式
+        self.use_gui = use_gui  # 是否使用 GUI 模式，为 None 时由 SUMO_BACKEND 决定
         self.switch_time = switch_time  # 初始化信号灯切换时间
         self.last_change_time = 0  # 初始化信号灯切换时间
         self.scenario_num = scenario_num  # 场景编号
         self.tripinfo_file = tripinfo_file  # TripInfo 输出文件路径
-
-        # 选择 SUMO 模式（GUI 或无 GUI）
-        self.sumo_cmd = ["sumo-gui" if use_gui else "sumo", "-c", self.config_file]
+        # 每个环境持有自己的带标签 TraCI 连接，这样同一进程或多个子进程中可以同时运行多个 SUMO 实例
+        self.label = label if label is not None else f"sumo_env_{os.getpid()}_{next(_connection_counter)}"
+        self.port = port  # TraCI 端口，为 None 时由 traci.start 选择一个空闲端口（libsumo 后端不使用）
+        self.conn = None  # 当前的 TraCI 连接
+        if reset_mode not in RESET_MODES:
+            raise ValueError(f"Unknown reset mode {reset_mode}, available modes are: {', '.join(RESET_MODES)}")
+        self.reset_mode = reset_mode  # reset 的方式
+        self.warmup_steps = warmup_steps  # 每个 episode 开始前先运行的预热步数
+        # reset_mode 为 state 时保存预热状态的文件，保存时用 mkstemp 创建，
+        # 避免多个进程中标签相同的环境（如并行试验中的 worker_0）读写同一个文件
+        self._state_file = None
+        # 多交叉口模式：控制路网中的所有信号灯，动作和观测按交叉口堆叠
+        self.multi_junction = multi_junction
+        self.tls_ids = ["junction"]  # 受控信号灯 ID
+        self.network = None  # 静态路网信息缓存（NetworkCache），从配置文件中的路网文件加载一次，之后各 episode 复用
+
+        # 选择 SUMO 模式（use_gui 为 None 时 SUMO_BACKEND 为 gui 才使用 GUI，libsumo 后端总是无 GUI）
+        self.sumo_cmd = [backend.sumo_binary(use_gui), "-c", self.config_file]
 
         # 如果指定了 TripInfo 文件，则添加到 sumo_cmd 中
         if self.tripinfo_file:
             self.sumo_cmd.extend(["--tripinfo-output", self.tripinfo_file])
 
-        # 定义动作空间（8 种信号灯相位）
-        self.action_space = spaces.Discrete(8)
-        # 定义观测空间，包含 20 维特征
-        self.observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=(20,), dtype=np.float32)
+        # 如果指定了随机种子，则每个 episode 使用相同的 SUMO 随机数种子（不同 seed 的环境得到不同的车流）
+        self.sumo_seed = seed  # 不覆盖 gym.Env.seed 方法
+        # 交叉口状态的遥测记录器（TelemetryRecorder），各 episode 共用，可随时 dump
+        self.telemetry = telemetry
+        # 分阶段计时器：启用时每步的各阶段耗时和 TraCI 命令数放在 step 返回的 info['perf'] 中
+        self.profiler = StepProfiler(enabled=profile)
+        if seed is not None:
+            self.sumo_cmd.extend(["--seed", str(seed)])
+
+        if self.multi_junction:
+            # 启动一次 SUMO 发现所有信号灯及其相位数，之后每个交叉口对应一个动作分量和一行观测
+            phase_counts = self._discover_junctions()
+            self.action_space = spaces.MultiDiscrete(phase_counts)
+            self._max_lanes = max(len(self.network.getControlledLanes(tls)) for tls in self.tls_ids)
+            self.observation_space = spaces.Box(
+                low=-np.inf, high=np.inf,
+                shape=(len(self.tls_ids), self._max_lanes * len(LANE_VARS) + JUNCTION_FEATURES), dtype=np.float32)
+        else:
+            # 定义动作空间（8 种信号灯相位）
+            self.action_space = spaces.Discrete(8)
+            # 定义观测空间，包含 20 维特征
+            self.observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=(OBS_SIZE,), dtype=np.float32)
 
         # 存储受控车道 ID
         self.lane_ids = []
+        self._unique_lane_ids = []  # 去重后的受控车道，即实际订阅的车道
+        self._lane_index = None  # lane_ids 中每个位置对应的去重车道下标
+        self._lane_metrics = None  # 预分配的 (去重车道数, 3) 车道指标数组，每步复用
+        self._lane_rows = None  # 按 lane_ids 顺序展开的车道指标数组，每步复用
+        self._features = None  # 完整特征向量（截断到 OBS_SIZE 之前），每步复用
+        self._junction_lane_index = None  # 多交叉口模式下 (交叉口数, 最大车道数) 的车道下标矩阵，空位指向补零行
+        self._junction_lane_counts = None  # 多交叉口模式下每个交叉口的受控车道数
+        self._obs = np.zeros(self.observation_space.shape, dtype=np.float32)  # 观测，每步复用
         self.manager = None  # SimulationManager 实例
+        self.vehicle_state = None  # 车辆状态快照（VehicleStateCache），与 SimulationManager 共享
         self.current_phase = 0  # 当前信号灯相位
 
     def reset(self):
         """重置环境"""
-        try:
-            traci.close()
-        except traci.exceptions.FatalTraCIError:
-            pass
+        if self.conn is None or self.reset_mode == "restart":
+            self.close()
+            self.conn = backend.start(self.sumo_cmd, port=self.port, label=self.label)
+            self.profiler.attach(self.conn)
+            self._warm_up()
+            if self.reset_mode == "state":
+                fd, self._state_file = tempfile.mkstemp(prefix=f"{self.label}_warmup_", suffix=".sbx")
+                os.close(fd)
+                self.conn.simulation.saveState(self._state_file)
+        else:
+            # 保持 SUMO 进程不退出，跳过进程启动和路网加载
+            backend.switch(self.label)
+            if self.reset_mode == "state":
+                self.conn.simulation.loadState(self._state_file)
+            else:
+                self.conn.load(self.sumo_cmd[1:])
+                self._warm_up()
 
-        traci.start(self.sumo_cmd)
         self.current_step = 0
         self.last_change_time = 0  # 重置上次切换时间
         self.current_phase = 0  # 重置当前信号灯相位
 
+        # 按恢复后的仿真状态重新订阅观测变量、重建车辆状态快照和 SimulationManager（及其交叉口控制器）
         # 获取受控车道列表
-        self.lane_ids = traci.trafficlight.getControlledLanes("junction")
+        if self.network is None:
+            self.network = NetworkCache.fromConfig(self.config_file, self.conn)
+        self.lane_ids = [lane_id for tls in self.tls_ids for lane_id in self.network.getControlledLanes(tls)]
+        self._subscribe_observation()
+
+        # 车辆状态快照额外订阅等待时间，奖励计算与车队逻辑共用同一份快照
+        self.vehicle_state = VehicleStateCache(extraVars=(tc.VAR_WAITING_TIME,), connection=self.conn)
+        self.vehicle_state.update()
+
+        # 遥测记录器跨 episode 共用，记录带上新的 episode 编号
+        if self.telemetry is not None:
+            self.telemetry.beginEpisode()
 
         # 初始化 SimulationManager
         scenario_config = SCENARIO_NUMBER_CONFIGS.get(self.scenario_num)
@@ -58,72 +151,176 @@ class SumoEnvWithPlatoon(gym.Env):
                 pCreation=scenario_config.enablePlatoons,
                 iCoordination=scenario_config.enableCoordination,
                 iZipping=scenario_config.enableZipping,
-                maxVehiclesPerPlatoon=scenario_config.maxVehiclesPerPlatoon
+                maxVehiclesPerPlatoon=scenario_config.maxVehiclesPerPlatoon,
+                stateCache=self.vehicle_state,
+                network=self.network,
+                telemetry=self.telemetry,
+                profiler=self.profiler
             )
 
         return self._get_observation()
 
+    def _discover_junctions(self):
+        """启动 SUMO 获取所有信号灯 ID、路网信息和各信号灯当前程序的相位数，完成后关闭连接"""
+        self.conn = backend.start(self.sumo_cmd, port=self.port, label=self.label)
+        try:
+            self.tls_ids = list(self.conn.trafficlight.getIDList())
+            if not self.tls_ids:
+                raise ValueError(f"No traffic lights found in {self.config_file}")
+            self.network = NetworkCache.fromConfig(self.config_file, self.conn)
+            phase_counts = []
+            for tls in self.tls_ids:
+                program = self.conn.trafficlight.getProgram(tls)
+                logics = self.conn.trafficlight.getAllProgramLogics(tls)
+                logic = next((l for l in logics if l.programID == program), logics[0])
+                phase_counts.append(len(logic.phases))
+        finally:
+            self.close()
+        return phase_counts
+
+    def _warm_up(self):
+        """运行预热步数，使每个 episode 从有车流的状态开始"""
+        for _ in range(self.warmup_steps):
+            self.conn.simulationStep()
+
     def step(self, action):
         """执行一个动作并返回新的状态、奖励和终止标志"""
         try:
-            current_time = traci.simulation.getTime()
+            # SimulationManager 和 Vehicle 使用 traci 的默认连接，先切换到本环境的连接
+            backend.switch(self.label)
+            profiler = self.profiler
+            profiler.begin_step()
+            current_time = self.conn.simulation.getTime()
 
             # 设置信号灯相位
-            traci.trafficlight.setPhase("junction", int(action))
-            self.current_phase = int(action)  # 更新当前信号灯相位
+            with profiler.phase("set_phase"):
+                if self.multi_junction:
+                    for tls, phase in zip(self.tls_ids, action):
+                        self.conn.trafficlight.setPhase(tls, int(phase))
+                    self.current_phase = np.array(action, dtype=np.int64)  # 更新各交叉口的信号灯相位
+                else:
+                    self.conn.trafficlight.setPhase("junction", int(action))
+                    self.current_phase = int(action)  # 更新当前信号灯相位
             self.last_change_time = current_time  # 更新上次切换时间
 
             # 运行一步仿真
-            traci.simulationStep()
+            with profiler.phase("simulation_step"):
+                self.conn.simulationStep()
             self.current_step += 1
+            with profiler.phase("vehicle_state"):
+                self.vehicle_state.update()  # 刷新本步的车辆状态快照
 
             # 处理车辆编队逻辑
             if self.manager:
-                self.manager.handleSimulationStep()
+                with profiler.phase("manager"):
+                    self.manager.handleSimulationStep()
 
             # 获取新的观测值
-            obs = self._get_observation()
+            with profiler.phase("observation"):
+                obs = self._get_observation()
             # 计算奖励
-            reward, total_waiting_time = self._calculate_reward()
+            with profiler.phase("reward"):
+                reward, total_waiting_time = self._calculate_reward()
 
             # 终止条件：达到最大步数或没有车辆
-            done = self.current_step >= self.max_steps or traci.simulation.getMinExpectedNumber() == 0
-            return obs, reward, done, {'total_waiting_time': total_waiting_time}
-        except traci.exceptions.FatalTraCIError as e:
+            done = self.current_step >= self.max_steps or self.conn.simulation.getMinExpectedNumber() == 0
+            info = {'total_waiting_time': total_waiting_time}
+            if profiler.enabled:
+                info['perf'] = profiler.results()
+            return obs, reward, done, info
+        except FatalTraCIError as e:
             print(f"TraCI Error: {e}")
             self.close()
             raise e
 
+    def _subscribe_observation(self):
+        """订阅受控车道和信号灯的观测变量，并预分配观测用的缓冲区"""
+        # 受控车道按信号连接列出，同一车道可能出现多次，只订阅一次
+        self._unique_lane_ids = list(dict.fromkeys(self.lane_ids))
+        positions = {lane_id: i for i, lane_id in enumerate(self._unique_lane_ids)}
+        self._lane_index = np.array([positions[lane_id] for lane_id in self.lane_ids], dtype=np.intp)
+        self._lane_metrics = np.zeros((len(self._unique_lane_ids), len(LANE_VARS)), dtype=np.float32)
+        self._lane_rows = np.zeros((len(self.lane_ids), len(LANE_VARS)), dtype=np.float32)
+        self._features = np.zeros(self._lane_rows.size + JUNCTION_FEATURES, dtype=np.float32)
+
+        if self.multi_junction:
+            # 每个交叉口的车道补齐到相同长度，空位指向车道指标数组末尾的补零行
+            padding = len(self._unique_lane_ids)
+            self._lane_metrics = np.zeros((padding + 1, len(LANE_VARS)), dtype=np.float32)
+            self._junction_lane_index = np.full((len(self.tls_ids), self._max_lanes), padding, dtype=np.intp)
+            self._junction_lane_counts = np.zeros(len(self.tls_ids), dtype=np.float32)
+            for j, tls in enumerate(self.tls_ids):
+                lanes = self.network.getControlledLanes(tls)
+                self._junction_lane_index[j, :len(lanes)] = [positions[lane_id] for lane_id in lanes]
+                self._junction_lane_counts[j] = len(lanes)
+            self._lane_rows = np.zeros(self._junction_lane_index.shape + (len(LANE_VARS),), dtype=np.float32)
+
+        for lane_id in self._unique_lane_ids:
+            self.conn.lane.subscribe(lane_id, LANE_VARS)
+        for tls in self.tls_ids:
+            self.conn.trafficlight.subscribe(tls, TLS_VARS)
+
     def _get_observation(self):
-        """获取当前环境的观测值"""
-        obs = []
-        total_waiting = 0  # 总等待车辆数
-        total_speed = 0  # 车辆总速度
-        vehicle_count = 0  # 统计车辆总数
-
-        for lane_id in self.lane_ids:
-            num_vehicles = traci.lane.getLastStepVehicleNumber(lane_id)  # 该车道上的车辆数
-            avg_speed = traci.lane.getLastStepMeanSpeed(lane_id)  # 该车道的平均速度
-            queue_length = traci.lane.getLastStepHaltingNumber(lane_id)  # 该车道上的排队车辆数
-
-            obs.extend([num_vehicles, avg_speed, queue_length])
-            total_waiting += queue_length
-            total_speed += avg_speed * num_vehicles
-            vehicle_count += num_vehicles
+        """获取当前环境的观测值（返回的数组每步复用，需要保留时请自行复制）"""
+        # 一次取回所有受控车道的订阅结果，写入预分配的数组
+        lane_results = self.conn.lane.getAllSubscriptionResults()
+        metrics = self._lane_metrics
+        for i, lane_id in enumerate(self._unique_lane_ids):
+            values = lane_results[lane_id]
+            metrics[i, 0] = values[tc.LAST_STEP_VEHICLE_NUMBER]  # 该车道上的车辆数
+            metrics[i, 1] = values[tc.LAST_STEP_MEAN_SPEED]  # 该车道的平均速度
+            metrics[i, 2] = values[tc.LAST_STEP_VEHICLE_HALTING_NUMBER]  # 该车道上的排队车辆数
+        if self.multi_junction:
+            return self._get_junction_observations()
+
+        # 按 lane_ids 的顺序展开（与逐车道统计时的顺序和重复一致）
+        rows = np.take(metrics, self._lane_index, axis=0, out=self._lane_rows)
+        num_vehicles, lane_speeds, queue_lengths = rows[:, 0], rows[:, 1], rows[:, 2]
+        vehicle_count = num_vehicles.sum()  # 统计车辆总数
 
         # 计算平均等待时间和平均速度
-        avg_waiting_time = total_waiting / len(self.lane_ids) if self.lane_ids else 0
-        avg_speed = total_speed / vehicle_count if vehicle_count > 0 else 0
+        avg_waiting_time = queue_lengths.sum() / len(self.lane_ids) if self.lane_ids else 0
+        avg_speed = np.dot(lane_speeds, num_vehicles) / vehicle_count if vehicle_count > 0 else 0
 
         # 获取信号灯状态和剩余时间
-        tls_state = traci.trafficlight.getRedYellowGreenState("junction")
-        tls_remaining_time = traci.trafficlight.getPhaseDuration("junction") - traci.trafficlight.getNextSwitch(
-            "junction")
-        obs.extend([tls_state == 'G', tls_remaining_time, avg_waiting_time, avg_speed])
-
-        # 保持观测向量长度为 20
-        obs = np.pad(obs, (0, 20 - len(obs)), mode='constant') if len(obs) < 20 else np.array(obs[:20],
-                                                                                              dtype=np.float32)
+        tls_values = self.conn.trafficlight.getSubscriptionResults("junction")
+        tls_state = tls_values[tc.TL_RED_YELLOW_GREEN_STATE]
+        tls_remaining_time = tls_values[tc.TL_PHASE_DURATION] - tls_values[tc.TL_NEXT_SWITCH]
+
+        features = self._features
+        features[:rows.size] = rows.ravel()
+        features[rows.size:] = (tls_state == 'G', tls_remaining_time, avg_waiting_time, avg_speed)
+
+        # 保持观测向量长度为 20（不足补零，超出截断）
+        n = min(OBS_SIZE, features.size)
+        self._obs[:n] = features[:n]
+        self._obs[n:] = 0
+        return self._obs
+
+    def _get_junction_observations(self):
+        """按交叉口堆叠观测：每行为该交叉口的车道指标（补零到相同长度）和信号灯、等待时间、速度特征"""
+        rows = np.take(self._lane_metrics, self._junction_lane_index, axis=0, out=self._lane_rows)
+        num_vehicles, lane_speeds, queue_lengths = rows[..., 0], rows[..., 1], rows[..., 2]
+        vehicle_counts = num_vehicles.sum(axis=1)  # 每个交叉口的车辆总数
+        lane_counts = self._junction_lane_counts
+
+        # 每个交叉口的平均等待时间和平均速度
+        avg_waiting_times = np.divide(queue_lengths.sum(axis=1), lane_counts,
+                                      out=np.zeros_like(lane_counts), where=lane_counts > 0)
+        avg_speeds = np.divide((lane_speeds * num_vehicles).sum(axis=1), vehicle_counts,
+                               out=np.zeros_like(vehicle_counts), where=vehicle_counts > 0)
+
+        # 一次取回所有信号灯的订阅结果
+        tls_results = self.conn.trafficlight.getAllSubscriptionResults()
+        obs = self._obs
+        width = rows.shape[1] * rows.shape[2]
+        obs[:, :width] = rows.reshape(len(self.tls_ids), width)
+        for j, tls in enumerate(self.tls_ids):
+            tls_values = tls_results[tls]
+            obs[j, width] = tls_values[tc.TL_RED_YELLOW_GREEN_STATE] == 'G'
+            obs[j, width + 1] = tls_values[tc.TL_PHASE_DURATION] - tls_values[tc.TL_NEXT_SWITCH]
+        obs[:, width + 2] = avg_waiting_times
+        obs[:, width + 3] = avg_speeds
         return obs
 
     def get_platoon_by_vehicle_id(self, vehicle_id):
@@ -141,16 +338,17 @@ class SumoEnvWithPlatoon(gym.Env):
 
     def _calculate_reward(self):
         """计算奖励函数（负数处理）"""
-        # 获取所有车辆 ID
-        vehicle_ids = traci.vehicle.getIDList()
-        num_vehicles = len(vehicle_ids) if vehicle_ids else 1  # 避免除以零
+        # 从本步的车辆状态快照中一次性取出所有车辆的等待时间和速度
+        waiting_times = self.vehicle_state.getArray(tc.VAR_WAITING_TIME)
+        speeds = self.vehicle_state.getArray(tc.VAR_SPEED)
+        num_vehicles = waiting_times.size if waiting_times.size else 1  # 避免除以零
 
         # 计算总等待时间和平均等待时间
-        total_waiting_time = sum(traci.vehicle.getWaitingTime(veh_id) for veh_id in vehicle_ids)
+        total_waiting_time = float(waiting_times.sum())
         avg_waiting_time = total_waiting_time / num_vehicles
 
         # 计算平均速度
-        avg_speed = np.mean([traci.vehicle.getSpeed(veh_id) for veh_id in vehicle_ids]) if vehicle_ids else 0
+        avg_speed = float(speeds.mean()) if speeds.size else 0
 
         # 统计已经通过交叉口的车辆
 
@@ -158,6 +356,16 @@ class SumoEnvWithPlatoon(gym.Env):
         # 计算每个车道上离交叉口最近的车队的等待时间
         closest_platoon_waiting_times = []
         closest_platoon_vehicle_counts = []  # 存储最近车队的车辆数
+        if self.manager:
+            for lane_id in self._unique_lane_ids:
+                platoons = self.manager.getPlatoonByLane(lane_id)
+                if not platoons:
+                    continue
+                closest = min(platoons, key=lambda p: p.getLanePositionFromFront())
+                # 车队成员的等待时间同样取自快照，不再逐车调用 TraCI
+                platoon_waiting = self.vehicle_state.getArray(tc.VAR_WAITING_TIME, closest.getAllVehiclesByName())
+                closest_platoon_waiting_times.append(float(platoon_waiting.mean()) if platoon_waiting.size else 0)
+                closest_platoon_vehicle_counts.append(platoon_waiting.size)
 
         # 计算最接近交叉口的车队的加权平均等待时间
 
@@ -177,7 +385,14 @@ class SumoEnvWithPlatoon(gym.Env):
 
     def close(self):
         """关闭 SUMO 环境"""
+        if self.conn is None:
+            return
         try:
-            traci.close()
-        except traci.exceptions.FatalTraCIError:
-            pass
\ No newline at end of file
+            self.conn.close()
+        except FatalTraCIError:
+            pass
+        self.conn = None
+        if self._state_file is not None:
+            if os.path.exists(self._state_file):
+                os.remove(self._state_file)
+            self._state_file = None
\ No newline at end of file
@@ -0,0 +1,108 @@
+import datetime
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def trial_key(params):
+    """试验的唯一标识：按键排序的超参数 JSON 字符串"""
+    return json.dumps(params, sort_keys=True)
+
+
+def load_finished_trials(results_file):
+    """
+    读取结果文件中已完成的试验。
+    崩溃时可能留下写了一半的最后一行（没有换行符），读取前将文件截断到最后一个换行符，
+    之后追加的记录不会与它连在一起，该试验会重新运行。
+    :param results_file: JSON Lines 格式的结果文件，每行一个试验
+    :return: 试验标识 -> 试验记录 的字典
+    """
+    finished = dict()
+    if not os.path.exists(results_file):
+        return finished
+    with open(results_file, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+    with open(results_file, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # 损坏的行，忽略它，该试验会重新运行
+            finished[trial_key(record["params"])] = record
+    return finished
+
+
+def _append_record(results_file, record):
+    """将一个试验记录追加到结果文件，并立即落盘"""
+    with open(results_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _run_trial(experiment, params, total_timesteps, model_dir, n_envs):
+    """在子进程中运行单个试验，返回试验记录"""
+    name = "_".join(f"{k}_{v}" for k, v in sorted(params.items()))
+    model_save_path = os.path.join(model_dir, f"PPO_MODEL_timesteps_{total_timesteps}_{name}.zip")
+    start = time.perf_counter()
+    rewards, num_timesteps = experiment(model_save_path=model_save_path, total_timesteps=total_timesteps,
+                                        n_envs=n_envs, **params)
+    wall_time = time.perf_counter() - start
+    return {
+        "params": params,
+        "episode_rewards": [float(r) for r in rewards],
+        "wall_time": wall_time,
+        "num_timesteps": num_timesteps,
+        "steps_per_sec": num_timesteps / wall_time,
+        "model_save_path": model_save_path,
+        "finished_at": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def run_sweep(experiment, grid, results_file, total_timesteps=5000, max_workers=2, model_dir="PPO_Platoon/model",
+              n_envs=1):
+    """
+    在进程池中运行超参数网格搜索。
+    每个试验完成后立即把 episode 奖励、耗时和每秒步数追加到结果文件；重新启动时跳过
+    结果文件中已完成的试验，因此长时间的搜索在崩溃后可以继续。
+    :param experiment: 训练函数（如 train_ppo_platoon.run_experiment），需为可被子进程导入的模块级函数，
+                       返回 (每个 episode 的总奖励, 实际训练的步数)
+    :param grid: 超参数名 -> 取值列表 的字典，对所有取值的组合进行搜索
+    :param results_file: JSON Lines 格式的结果文件
+    :param total_timesteps: 每个试验的总训练步数
+    :param max_workers: 同时运行的试验数，同时运行的 SUMO 实例数不超过 max_workers * n_envs
+    :param model_dir: 模型保存目录
+    :param n_envs: 每个试验的并行环境数
+    :return: 按网格顺序排列的所有已完成试验的记录
+    """
+    names = list(grid.keys())
+    trials = [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+    finished = load_finished_trials(results_file)
+    pending = [params for params in trials if trial_key(params) not in finished]
+    print(f"Sweep: {len(trials)} trials, {len(trials) - len(pending)} already finished, {len(pending)} to run")
+
+    os.makedirs(os.path.dirname(results_file) or ".", exist_ok=True)
+    os.makedirs(model_dir, exist_ok=True)
+    # 使用 spawn 启动子进程，避免 fork 时复制 PyTorch 和 TraCI 的状态
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+        futures = {pool.submit(_run_trial, experiment, params, total_timesteps, model_dir, n_envs): params
+                   for params in pending}
+        for future in as_completed(futures):
+            params = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                # 失败的试验不写入结果文件，下次启动时会重新运行
+                print(f"Trial {params} failed: {e}")
+                continue
+            _append_record(results_file, record)
+            finished[trial_key(params)] = record
+            print(f"Trial {params} finished in {record['wall_time']:.1f} s ({record['steps_per_sec']:.1f} steps/s)")
+
+    return [finished[trial_key(params)] for params in trials if trial_key(params) in finished]
@@ -0,0 +1,105 @@
+import numpy as np
+
+# 每条交叉口记录的字段：episode、仿真步、仿真时间、控制器下标、预留时间、管理的车队数、“压缩”通行顺序中的车辆数
+INTERSECTION_EVENT = np.dtype([
+    ("episode", np.int32),
+    ("step", np.int64),
+    ("time", np.float64),
+    ("controller", np.int32),
+    ("reservedTime", np.float64),
+    ("platoons", np.int32),
+    ("zipOrderSize", np.int32),
+])
+
+
+class TelemetryRecorder():
+    """
+    交叉口状态的结构化遥测记录，取代每步每个交叉口的 DEBUG 日志。
+    记录写入预分配的 NumPy 结构数组（环形缓冲区，写满后覆盖最早的记录），记录时不做任何字符串格式化；
+    按 sampleEvery 采样仿真步，需要时（或仿真结束时）通过 dump 一次性按列写入 .npz 文件。
+    同一记录器可以跨 episode 共用：每个 episode 开始时调用 beginEpisode，仿真步在每个 episode 中从 0 开始，
+    记录中的 episode 字段用于区分不同 episode；同名交叉口在各 episode 中使用同一个控制器下标。
+    """
+
+    def __init__(self, capacity=65536, sampleEvery=1):
+        """
+        初始化记录器。
+        :param capacity: 环形缓冲区的记录数
+        :param sampleEvery: 每隔多少个仿真步记录一次
+        """
+        self.events = np.zeros(capacity, dtype=INTERSECTION_EVENT)
+        self.capacity = capacity
+        self.sampleEvery = max(int(sampleEvery), 1)
+        self.controllers = []  # 控制器下标 -> 交叉口名称
+        self._controllerIndex = dict()  # 交叉口名称 -> 控制器下标
+        self.episode = 0  # 当前 episode 编号，第一次调用 beginEpisode 后为 1
+        self.count = 0  # 累计写入的记录数（包括已被覆盖的）
+        self.sampling = False  # 当前仿真步是否记录
+        self._step = 0
+        self._time = 0.0
+
+    def registerController(self, name):
+        """
+        注册一个交叉口控制器，已注册的交叉口（如 reset 后重建的控制器）复用原来的下标。
+        :param name: 交叉口名称
+        :return: 记录中使用的控制器下标
+        """
+        index = self._controllerIndex.get(name)
+        if index is None:
+            index = self._controllerIndex[name] = len(self.controllers)
+            self.controllers.append(name)
+        return index
+
+    def beginEpisode(self):
+        """
+        开始一个新的 episode，之后的记录带有新的 episode 编号。
+        :return: 新的 episode 编号
+        """
+        self.episode += 1
+        return self.episode
+
+    def beginStep(self, step, time):
+        """
+        开始一个仿真步，决定本步是否记录。
+        :param step: 仿真步编号
+        :param time: 仿真时间
+        """
+        self._step = step
+        self._time = time
+        self.sampling = step % self.sampleEvery == 0
+
+    def recordIntersection(self, controller, reservedTime, platoons, zipOrderSize):
+        """
+        记录一个交叉口在当前仿真步的状态（调用方应先检查 sampling）。
+        :param controller: registerController 返回的控制器下标
+        :param reservedTime: 预留的时间
+        :param platoons: 控制器管理的车队数
+        :param zipOrderSize: “压缩”通行顺序中的车辆数
+        """
+        self.events[self.count % self.capacity] = (self.episode, self._step, self._time, controller, reservedTime,
+                                                   platoons, zipOrderSize)
+        self.count += 1
+
+    def snapshot(self):
+        """
+        按时间顺序返回缓冲区中保留的记录（副本）。
+        """
+        if self.count <= self.capacity:
+            return self.events[:self.count].copy()
+        start = self.count % self.capacity
+        return np.concatenate((self.events[start:], self.events[:start]))
+
+    def dump(self, path):
+        """
+        将缓冲区中保留的记录按列写入 .npz 文件，每个字段一个数组，controllers 为控制器名称。
+        :param path: 输出文件路径
+        """
+        events = self.snapshot()
+        np.savez(path, controllers=np.array(self.controllers), dropped=self.count - len(events),
+                 **{field: events[field] for field in INTERSECTION_EVENT.names})
+
+    def clear(self):
+        """
+        清空已记录的事件（保留控制器注册）。
+        """
+        self.count = 0
@@ -1,6 +1,8 @@
 from stable_baselines3 import PPO
 from sumo_env import SumoEnvWithPlatoon
+from sweep import run_sweep
 from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.vec_env import SubprocVecEnv
 import matplotlib.pyplot as plt
 import os
 import torch
@@ -8,43 +10,77 @@ from tqdm import tqdm
 import time
 from torch.utils.tensorboard import SummaryWriter
 import datetime
+import argparse
+import functools
+import numpy as np
 
 # 自定义回调函数，用于在训练过程中跟踪每个episode的总奖励
 class RewardTrackingCallback(BaseCallback):
     def __init__(self, verbose=0):
         super(RewardTrackingCallback, self).__init__(verbose)
-        self.episode_rewards = []  # 用于存储每个 episode 的总奖励
-        self.episode_reward = 0  # 当前 episode 的奖励
+        self.episode_rewards = []  # 用于存储每个 episode 的总奖励（多个并行环境按结束顺序存储）
+        self.episode_reward = None  # 每个并行环境当前 episode 的奖励
 
     def _on_step(self):
-        reward = self.locals["rewards"][0]  # 获取当前步的奖励
-        self.episode_reward += reward  # 累加当前 episode 的奖励
-        done = self.locals["dones"][0]  # 检查是否 episode 结束
-        if done:
-            self.episode_rewards.append(self.episode_reward)  # 保存当前 episode 的总奖励
-            self.episode_reward = 0  # 重置当前 episode 的奖励
+        rewards = self.locals["rewards"]  # 获取所有并行环境当前步的奖励
+        if self.episode_reward is None:
+            self.episode_reward = np.zeros(len(rewards))
+        self.episode_reward += rewards  # 累加当前 episode 的奖励
+        dones = self.locals["dones"]  # 检查哪些环境的 episode 结束
+        for i in np.flatnonzero(dones):
+            self.episode_rewards.append(float(self.episode_reward[i]))  # 保存该环境当前 episode 的总奖励
+            self.episode_reward[i] = 0  # 重置该环境当前 episode 的奖励
         return True
 
 
+# 自定义回调函数，用 tqdm 显示训练进度
+class TQDMProgressCallback(BaseCallback):
+    def __init__(self, total_timesteps, verbose=0):
+        super(TQDMProgressCallback, self).__init__(verbose)
+        self.total_timesteps = total_timesteps  # 总训练步数
+        self.pbar = None  # tqdm 进度条
 
+    def _on_training_start(self):
+        self.pbar = tqdm(total=self.total_timesteps)  # 训练开始时创建进度条
 
     def _on_step(self):
-        # 检查是否 episode 结束
-        done = self.locals.get("dones", [False])[0]
-        if done:
-            # 确保当前 episode 的奖励已经被存储
-            if len(self.reward_callback.episode_rewards) > self.episode_count:
-                episode_reward = self.reward_callback.episode_rewards[self.episode_count]  # 获取当前 episode 的总奖励
-                # 将当前 episode 的总奖励写入 TensorBoard
-                self.writer.add_scalar("Reward/episode", episode_reward, self.episode_count)
-                # 打印当前 episode 的总奖励
-                print(f"Episode {self.episode_count + 1}: Total Reward = {episode_reward}")
-                self.episode_count += 1  # 更新 episode 计数器
+        self.pbar.n = self.num_timesteps  # 按已训练的总步数更新进度条（兼容多个并行环境）
+        self.pbar.refresh()
+        return True
+
+    def _on_training_end(self):
+        self.pbar.close()  # 训练结束时关闭进度条
+
+
+# 自定义回调函数，将奖励和损失写入 TensorBoard
+class TensorboardCallback(BaseCallback):
+    def __init__(self, reward_callback, experiment_name, verbose=0):
+        super(TensorboardCallback, self).__init__(verbose)
+        self.reward_callback = reward_callback  # 用于读取每个 episode 总奖励的回调函数
+        self.writer = SummaryWriter(log_dir=os.path.join("PPO_Platoon/tensorboard", experiment_name))
+        self.episode_count = 0  # 已写入 TensorBoard 的 episode 数
+
+    def _on_step(self):
+        # 写入本步结束的所有 episode（奖励跟踪回调先于本回调运行，多个并行环境可能在同一步结束）
+        episode_rewards = self.reward_callback.episode_rewards
+        while self.episode_count < len(episode_rewards):
+            episode_reward = episode_rewards[self.episode_count]  # 获取该 episode 的总奖励
+            # 将该 episode 的总奖励写入 TensorBoard
+            self.writer.add_scalar("Reward/episode", episode_reward, self.episode_count)
+            # 打印该 episode 的总奖励
+            print(f"Episode {self.episode_count + 1}: Total Reward = {episode_reward}")
+            self.episode_count += 1  # 更新 episode 计数器
 
         # 记录每一步的奖励
         if "rewards" in self.locals:
             self.writer.add_scalar("Reward/step", self.locals["rewards"][0], self.num_timesteps)
 
+        # 记录各阶段的耗时和 TraCI 命令数（环境启用 profile 时才有）
+        infos = self.locals.get("infos")
+        if infos and "perf" in infos[0]:
+            for key, value in infos[0]["perf"].items():
+                self.writer.add_scalar(f"Perf/{key}", value, self.num_timesteps)
+
         # 记录损失值（如果模型已经初始化）
         if self.model is not None:
             # 获取模型的损失值
@@ -60,9 +96,24 @@ class RewardTrackingCallback(BaseCallback):
 
 
 
+# 创建第 rank 个并行环境的工厂函数，每个环境使用独立的 TraCI 连接标签（和端口）
+# profile 为 True 时环境启用分阶段计时，各阶段耗时和 TraCI 命令数由 TensorboardCallback 写入 Perf/*
+def make_env(rank, base_port=None, profile=False):
+    def _init():
+        port = base_port + rank if base_port is not None else None
+        return SumoEnvWithPlatoon(config_file="../maps/s.sumocfg", max_steps=500, label=f"worker_{rank}", port=port,
+                                  profile=profile)
+    return _init
+
+
 # 运行PPO算法的函数，支持不同的超参数配置
-def run_experiment(batch_size, gamma, clip_range, n_steps, model_save_path, learning_rate=0.0003, total_timesteps=5000):
-    env = SumoEnvWithPlatoon(config_file="../maps/s.sumocfg", max_steps=500)  # 初始化SUMO环境
+# n_envs 大于 1 时使用 SubprocVecEnv 在 n_envs 个进程中并行采集数据（n_steps 为每个环境的步数）
+def run_experiment(batch_size, gamma, clip_range, n_steps, model_save_path, learning_rate=0.0003, total_timesteps=5000,
+                   n_envs=1, base_port=None, profile=False):
+    if n_envs > 1:
+        env = SubprocVecEnv([make_env(rank, base_port, profile) for rank in range(n_envs)])  # 初始化多个并行的SUMO环境
+    else:
+        env = make_env(0, base_port, profile)()  # 初始化SUMO环境
 
     device = "cuda" if torch.cuda.is_available() else "cpu"
     print(f"Using device: {device}")
@@ -93,7 +144,8 @@ def run_experiment(batch_size, gamma, clip_range, n_steps, model_save_path, lear
                 callback=[reward_callback, tqdm_callback, tensorboard_callback])  # 训练模型
     model.save(model_save_path)  # 训练完成后保存模型
     env.close()  # 关闭环境
-    return reward_callback.episode_rewards  # 返回每个episode的总奖励
+    # 返回每个episode的总奖励和实际训练的步数（按 n_steps * n_envs 取整，可能多于 total_timesteps）
+    return reward_callback.episode_rewards, model.num_timesteps
 
 
 # 超参数配置
@@ -102,31 +154,40 @@ gammas = []  # 折扣因子列表
 clip_ranges = []  # 截断范围列表
 n_steps_list = []  # 每个episode的步数列表
 learning_rates = []  # 学习率列表
-total_timesteps =   # 总训练步数
-
-
-
-# 绘制不同批量大小和学习率下的总奖励曲线
-plt.figure(figsize=(10, 6))
-for batch_size in batch_sizes:
-    for learning_rate in learning_rates:
-         # 生成模型保存路径，包含 timesteps、batch_size 和 learning_rate
-        model_save_path = os.path.join(
-            "PPO_Platoon/model",
-            f"{current_datetime}_PPO_MODEL_timesteps_{total_timesteps}_batch_size_{batch_size}_lr_{learning_rate}.zip"
-        )
-        rewards = run_experiment(
-            batch_size=batch_size,
-            gamma=,
-            clip_range=,
-            n_steps=256,
-            model_save_path=model_save_path,
-            learning_rate=learning_rate,
-            total_timesteps=total_timesteps
-        )
-        plt.plot(rewards, label=f"batch_size={batch_size}, lr={learning_rate}")
-plt.xlabel("Episode")
-plt.ylabel("Total reward")
-plt.title("Total Reward Curves for Different Batch Sizes, Learning Rates, and n_steps")
-plt.legend()
-plt.show()
\ No newline at end of file
+total_timesteps = 5000  # 总训练步数
+max_workers = 2  # 同时运行的试验数（每个试验运行 n_envs 个 SUMO 实例）
+results_file = "PPO_Platoon/sweep_results.jsonl"  # 试验结果文件，重新启动时跳过其中已完成的试验
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the PPO hyperparameter sweep")
+    parser.add_argument("--profile", action="store_true", help="启用分阶段计时，并将各阶段耗时写入 TensorBoard 的 Perf/*")
+    args = parser.parse_args()
+
+    # 在进程池中运行超参数网格，每个试验完成后立即写入结果文件
+    records = run_sweep(
+        functools.partial(run_experiment, profile=args.profile),
+        grid={
+            "batch_size": batch_sizes,
+            "gamma": gammas,
+            "clip_range": clip_ranges,
+            "n_steps": n_steps_list,
+            "learning_rate": learning_rates,
+        },
+        results_file=results_file,
+        total_timesteps=total_timesteps,
+        max_workers=max_workers,
+        model_dir="PPO_Platoon/model"
+    )
+
+    # 绘制不同超参数组合下的总奖励曲线
+    plt.figure(figsize=(10, 6))
+    for record in records:
+        params = record["params"]
+        plt.plot(record["episode_rewards"],
+                 label=f"batch_size={params['batch_size']}, lr={params['learning_rate']}, n_steps={params['n_steps']}")
+    plt.xlabel("Episode")
+    plt.ylabel("Total reward")
+    plt.title("Total Reward Curves for Different Batch Sizes, Learning Rates, and n_steps")
+    plt.legend()
+    plt.show()
\ No newline at end of file
@@ -0,0 +1,121 @@
+import os
+import xml.etree.ElementTree as ET
+
+# tripinfo 中 fuel_abs 和 CO2_abs 的单位为 mg，汽油密度约 745 g/L
+FUEL_MG_PER_LITER = 745000.0
+MG_PER_G = 1000.0
+
+
+class TripinfoAggregator:
+    """
+    流式统计 tripinfo 输出：行程时间（duration）、延误（timeLoss）、油耗（fuel_abs）和 CO₂ 排放（CO2_abs）。
+    只累加总和，已处理的元素会被立即清除，内存占用与文件大小无关。
+    既可以在仿真结束后用 parse 一次性读取整个文件，也可以在仿真过程中用 poll 增量读取已写出的部分（tail），
+    这样 episode 一结束就能得到统计结果。
+    """
+
+    def __init__(self, path=None, read_size=1 << 16):
+        """
+        :param path: tripinfo 文件路径（poll 时使用）
+        :param read_size: poll 每次读取的字节数
+        """
+        self.path = path
+        self.read_size = read_size
+        self.reset()
+
+    def reset(self):
+        """清空统计结果和增量读取的位置（同一文件在新 episode 中被重新写出时调用）"""
+        self.trip_count = 0
+        self.travel_time_sum = 0.0
+        self.delay_sum = 0.0
+        self.route_length_sum = 0.0
+        self.fuel_sum = 0.0
+        self.co2_sum = 0.0
+        self.emission_trip_count = 0  # 带有 emissions 子元素的行程数
+        self.emission_route_length_sum = 0.0
+        self._offset = 0
+        self._parser = None
+        self._root = None
+
+    def add_trip(self, attrib, emissions=None):
+        """
+        累加一条行程。
+        :param attrib: tripinfo 元素的属性
+        :param emissions: emissions 子元素的属性（未启用排放设备时为 None）
+        """
+        route_length = float(attrib.get('routeLength', 0))
+        self.trip_count += 1
+        self.travel_time_sum += float(attrib.get('duration', 0))
+        self.delay_sum += float(attrib.get('timeLoss', 0))
+        self.route_length_sum += route_length
+        if emissions is not None:
+            self.emission_trip_count += 1
+            self.emission_route_length_sum += route_length
+            self.fuel_sum += float(emissions.get('fuel_abs', 0))
+            self.co2_sum += float(emissions.get('CO2_abs', 0))
+
+    def parse(self, source=None):
+        """
+        用 iterparse 流式读取整个 tripinfo 文件。
+        :param source: 文件路径或文件对象，默认为 self.path
+        """
+        source = source if source is not None else self.path
+        root = None
+        for event, elem in ET.iterparse(source, events=("start", "end")):
+            if root is None:
+                root = elem
+            elif event == "end":
+                self._handle(elem, root)
+        return self
+
+    def poll(self):
+        """
+        读取 tripinfo 文件中自上次调用以来新写出的部分，返回本次新增的行程数。
+        文件尚未创建时直接返回 0；不完整的元素会保留在解析器中，等下次写出剩余部分后再统计。
+        """
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        if os.path.getsize(self.path) < self._offset:
+            # 文件被新的仿真重新写出，从头开始统计
+            self.reset()
+        if self._parser is None:
+            self._parser = ET.XMLPullParser(events=("start", "end"))
+        count = self.trip_count
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            while True:
+                chunk = f.read(self.read_size)
+                if not chunk:
+                    break
+                self._offset += len(chunk)
+                self._parser.feed(chunk)
+                for event, elem in self._parser.read_events():
+                    if self._root is None:
+                        self._root = elem
+                    elif event == "end":
+                        self._handle(elem, self._root)
+        return self.trip_count - count
+
+    def _handle(self, elem, root):
+        """统计一个解析完成的 tripinfo 元素，然后将其从根元素中清除"""
+        if elem.tag != "tripinfo":
+            return
+        emissions = elem.find("emissions")
+        self.add_trip(elem.attrib, emissions.attrib if emissions is not None else None)
+        elem.clear()
+        root.clear()
+
+    def summary(self):
+        """
+        返回当前的统计结果。
+        :return: 字典，包含行程数、平均行程时间（s）、平均延误（s）、平均油耗（L/100km）和平均 CO₂ 排放（g/km）
+        """
+        trips = self.trip_count
+        emission_km = self.emission_route_length_sum / 1000.0
+        return {
+            'trip_count': trips,
+            'avg_travel_time': self.travel_time_sum / trips if trips else 0.0,
+            'avg_delay': self.delay_sum / trips if trips else 0.0,
+            'avg_fuel_consumption': self.fuel_sum / FUEL_MG_PER_LITER / emission_km * 100 if emission_km else 0.0,
+            'avg_co2_emission': self.co2_sum / MG_PER_G / emission_km if emission_km else 0.0,
+        }
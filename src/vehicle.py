@@ -1,10 +1,62 @@
-import traci
+import sys
+
+from backend import traci
+from backend import tc
+from vehiclestate import LEADER_DISTANCE, MISSING
+
+class RouteCache():
+    """
+    路线 ID -> 路线（由驻留的道路 ID 组成的元组）的共享缓存，使用同一路线的车辆共享同一个元组。
+    缓存属于一次仿真（由 SimulationManager 持有），按引用计数保存：最后一辆使用该路线的车辆离开路网后删除该条目，
+    因此每车独有的路线（如 “!车辆ID” 形式的内联路线）不会随累计出发的车辆数增长，重新加载仿真后也不会读到旧的路线。
+    """
+
+    def __init__(self):
+        self._routes = dict()  # 路线 ID -> [路线, 引用计数]
+
+    def acquire(self, vehicle):
+        """
+        获取车辆当前路线 ID 对应的共享路线并增加引用计数，第一次遇到该路线 ID 时才向 TraCI 读取。
+        :param vehicle: 车辆名称
+        :return: (路线 ID, 路线)
+        """
+        routeID = traci.vehicle.getRouteID(vehicle)
+        entry = self._routes.get(routeID)
+        if entry is None:
+            entry = self._routes[routeID] = [tuple(sys.intern(edge) for edge in traci.vehicle.getRoute(vehicle)), 0]
+        entry[1] += 1
+        return routeID, entry[0]
+
+    def release(self, routeID):
+        """
+        减少路线的引用计数，没有车辆使用时删除该条目。
+        :param routeID: acquire 返回的路线 ID
+        """
+        entry = self._routes.get(routeID)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._routes[routeID]
+
+    def __len__(self):
+        return len(self._routes)
 
 
 class Vehicle():
+    # 使用 __slots__ 代替实例字典，减少大量车辆同时存在时的内存占用
+    __slots__ = ("_active", "_acceleration", "_length", "_maxSpeed", "_name", "_route", "_routeID", "_routeCache",
+                 "_previouslySetValues",
+                 "_stateCache", "_position", "_speed", "_neighbors", "_weights", "_store", "_slot", "_commandBuffer", "_network")
+
     # 车辆类的初始化方法，用于创建一个车辆对象
     # 参数 vehicle 是车辆的名称
-    def __init__(self, vehicle):
+    # 参数 stateCache 是共享的每步状态快照（VehicleStateCache），为 None 时直接调用 TraCI
+    # 参数 store 是共享的结构数组存储（VehicleArrayStore），不为 None 时位置、速度和加速度保存在其中
+    # 参数 commandBuffer 是共享的命令缓冲区（CommandBuffer），不为 None 时 setter 的命令在下一步之前统一发送
+    # 参数 network 是静态路网信息缓存（NetworkCache），不为 None 时车道长度从其中读取
+    # 参数 routeCache 是共享的路线缓存（RouteCache），不为 None 时同一路线的车辆共享路线元组，车辆离开路网后调用 releaseRoute
+    def __init__(self, vehicle, stateCache=None, store=None, commandBuffer=None, network=None, routeCache=None):
         # 标记车辆是否处于活动状态，初始化为 True
         self._active = True
         # 获取车辆的加速度，并存储在实例变量 _acceleration 中
@@ -15,10 +67,21 @@ class Vehicle():
         self._maxSpeed = traci.vehicle.getMaxSpeed(vehicle)
         # 存储车辆的名称
         self._name = vehicle
-        # 获取车辆的路线，并存储在实例变量 _route 中
-        self._route = traci.vehicle.getRoute(vehicle)
-        # 用于存储之前设置过的属性值，初始化为一个空字典
-        self._previouslySetValues = dict()
+        # 获取车辆的路线（有路线缓存时同一路线 ID 的车辆共享），并存储在实例变量 _route 中
+        self._routeCache = routeCache
+        if routeCache is not None:
+            self._routeID, self._route = routeCache.acquire(vehicle)
+        else:
+            self._routeID = None
+            self._route = tuple(traci.vehicle.getRoute(vehicle))
+        # 用于存储之前设置过的属性值，第一次设置属性时才创建字典
+        self._previouslySetValues = None
+        # 每步的车辆状态快照，getter 优先从这里读取
+        self._stateCache = stateCache
+        # 每步的命令缓冲区，setter 的命令放入这里
+        self._commandBuffer = commandBuffer
+        # 静态路网信息缓存
+        self._network = network
         self._position = traci.vehicle.getLanePosition(vehicle)  # 车辆位置
         self._speed = traci.vehicle.getSpeed(vehicle)  # 车辆速度
          # 车辆加速度
@@ -26,6 +89,14 @@ class Vehicle():
         # 调节系数
         # 邻居权重
         # 期望车距
+        # 邻居车辆列表和邻居权重在第一次添加邻居时才创建
+        self._neighbors = None
+        self._weights = None
+        # 结构数组存储及车辆在其中的槽位
+        self._store = None
+        self._slot = None
+        if store is not None:
+            self.attachStore(store)
 
     def update_dynamics(self, T):
         """
@@ -44,51 +115,102 @@ class Vehicle():
         """
         获取车辆的状态向量 [位置, 速度]。
         """
+        if self._store is not None:
+            return self._store.getState(self._slot)
         return [self._position, self._speed]
 
+    def attachStore(self, store):
+        """
+        将车辆的位置、速度和加速度移入结构数组存储。
+        :param store: VehicleArrayStore 对象
+        """
+        self._slot = store.allocate(self._position, self._speed, self._acceleration, self._maxSpeed)
+        self._store = store
+        self._position = self._speed = self._acceleration = None
+
+    def detachStore(self):
+        """
+        将车辆的位置、速度和加速度从结构数组存储中取回，并释放其槽位。
+        """
+        if self._store is None:
+            return
+        store, slot = self._store, self._slot
+        self._position = float(store.position[slot])
+        self._speed = float(store.speed[slot])
+        self._acceleration = float(store.acceleration[slot])
+        store.release(slot)
+        self._store = None
+        self._slot = None
+
+    def releaseRoute(self):
+        """
+        车辆离开路网后释放其在共享路线缓存中的引用。
+        """
+        if self._routeCache is None:
+            return
+        self._routeCache.release(self._routeID)
+        self._routeCache = None
+
     def add_neighbor(self, neighbor, weight):
         """
         添加邻居车辆及其权重。
         :param neighbor: 邻居车辆对象
         :param weight: 权重
         """
+        if self._neighbors is None:
+            self._neighbors = []
+            self._weights = dict()
         self._neighbors.append(neighbor)
         self._weights[neighbor] = weight
 
+    # 获取邻居车辆及其权重，没有添加过邻居时返回空字典
+    def getNeighborWeights(self):
+        return self._weights or dict()
+
+    # 获取车辆在结构数组存储中的槽位，未使用存储时返回 None
+    def getStoreSlot(self):
+        return self._slot
+
     # 获取车辆的加速度
     def getAcceleration(self):
+        if self._store is not None:
+            return float(self._store.acceleration[self._slot])
         return self._acceleration
 
     # 判断车辆是否处于活动状态
-
+    def isActive(self):
+        return self._active
 
     # 获取车辆所在的道路 ID
     def getEdge(self):
-        return traci.vehicle.getRoadID(self.getName())
+        return self._getState(tc.VAR_ROAD_ID, traci.vehicle.getRoadID)
 
     # 获取车辆所在的车道 ID
     def getLane(self):
-        return traci.vehicle.getLaneID(self.getName())
+        return self._getState(tc.VAR_LANE_ID, traci.vehicle.getLaneID)
 
     # 获取车辆所在车道的索引
     def getLaneIndex(self):
-        return traci.vehicle.getLaneIndex(self.getName())
+        return self._getState(tc.VAR_LANE_INDEX, traci.vehicle.getLaneIndex)
 
     # 获取车辆在车道上的位置
     def getLanePosition(self):
-        return traci.vehicle.getLanePosition(self.getName())
+        return self._getState(tc.VAR_LANEPOSITION, traci.vehicle.getLanePosition)
 
     # 获取车辆距离车道前端的位置
     def getLanePositionFromFront(self):
-        # 先获取车辆所在车道的长度
-        lane_length = traci.lane.getLength(self.getLane())
+        # 先获取车辆所在车道的长度（车道长度不会变化，优先从路网缓存读取）
+        if self._network is not None:
+            lane_length = self._network.getLaneLength(self.getLane())
+        else:
+            lane_length = traci.lane.getLength(self.getLane())
         # 用车道长度减去车辆在车道上的位置，得到距离前端的位置
         return lane_length - self.getLanePosition()
 
     # 获取车辆前方的领头车辆
     def getLeader(self):
-        # 调用 traci.vehicle.getLeader 方法，查找距离 20 米内的领头车辆
-        return traci.vehicle.getLeader(self.getName(), 20)
+        # 查找距离 20 米内的领头车辆（快照中没有时调用 traci.vehicle.getLeader）
+        return self._getState(tc.VAR_LEADER, traci.vehicle.getLeader, LEADER_DISTANCE)
 
     # 获取车辆的长度
     def getLength(self):
@@ -105,7 +227,7 @@ class Vehicle():
     # 获取车辆剩余的路线
     def getRemainingRoute(self):
         # 获取车辆当前在路线中的索引
-        current_index = traci.vehicle.getRouteIndex(self.getName())
+        current_index = self._getState(tc.VAR_ROUTE_INDEX, traci.vehicle.getRouteIndex)
         # 返回从当前索引开始的剩余路线
         return self._route[current_index:]
 
@@ -115,7 +237,7 @@ class Vehicle():
 
     # 获取车辆的当前速度
     def getSpeed(self):
-        return traci.vehicle.getSpeed(self.getName())
+        return self._getState(tc.VAR_SPEED, traci.vehicle.getSpeed)
 
     # 设置车辆的颜色
     def setColor(self, color):
@@ -138,8 +260,14 @@ class Vehicle():
 
     # 设置车辆要变更到的目标车道
     def setTargetLane(self, lane):
-        # 调用 traci.vehicle.changeLane 方法，让车辆以 0.5 的安全性尝试变更到指定车道
-        traci.vehicle.changeLane(self.getName(), lane, 0.5)
+        # 调用 traci.vehicle.changeLane 方法，让车辆在 0.5 秒内尝试变更到指定车道
+        # 换道请求每次都发送（不与上次的值比较），有命令缓冲区时同样放入缓冲区，与速度命令按放入的顺序发送
+        if not self.isActive():
+            return
+        if self._commandBuffer is not None:
+            self._commandBuffer.enqueue(self.getName(), "changeLane", lane, 0.5)
+        else:
+            traci.vehicle.changeLane(self.getName(), lane, 0.5)
 
     # 设置车辆的时间间隔参数 tau
     def setTau(self, tau):
@@ -161,16 +289,32 @@ class Vehicle():
         # 调用内部的 _setAttr 方法来设置速度因子属性
         self._setAttr("setSpeedFactor", speedFactor)
 
+    # 内部方法，优先从当前步的状态快照读取车辆变量，快照中没有时退回到直接的 TraCI 调用
+    def _getState(self, var, getter, *args):
+        if self._stateCache is not None:
+            value = self._stateCache.get(self._name, var)
+            if value is not MISSING:
+                return value
+        return getter(self._name, *args)
+
     # 内部方法，用于设置车辆的属性
     def _setAttr(self, attr, arg):
         # 只有当车辆处于活动状态时才进行属性设置
         if self.isActive():
+            if self._previouslySetValues is None:
+                self._previouslySetValues = dict()
             # 检查该属性是否已经设置过
             if attr in self._previouslySetValues:
                 # 如果设置过，且新值与旧值相同，则不进行设置，提高性能
                 if self._previouslySetValues[attr] == arg:
+                    if self._commandBuffer is not None:
+                        self._commandBuffer.suppress()
                     return
             # 记录新的属性值
             self._previouslySetValues[attr] = arg
-            # 使用 getattr 动态调用 traci.vehicle 模块中的相应方法来设置属性
-            getattr(traci.vehicle, attr)(self.getName(), arg)
\ No newline at end of file
+            if self._commandBuffer is not None:
+                # 放入命令缓冲区，在下一步仿真之前统一发送
+                self._commandBuffer.enqueue(self.getName(), attr, arg)
+            else:
+                # 使用 getattr 动态调用 traci.vehicle 模块中的相应方法来设置属性
+                getattr(traci.vehicle, attr)(self.getName(), arg)
\ No newline at end of file
@@ -0,0 +1,103 @@
+import numpy as np
+from backend import traci
+from backend import tc  # TraCI 变量常量
+
+# Vehicle 的 getter 需要的车辆变量，每辆车出发时一次性订阅
+VEHICLE_VARS = (tc.VAR_SPEED, tc.VAR_LANE_ID, tc.VAR_LANE_INDEX, tc.VAR_LANEPOSITION,
+                tc.VAR_ROAD_ID, tc.VAR_ROUTE_INDEX, tc.VAR_LEADER)
+# 仿真级别的订阅变量：当前时间、本步新出发的车辆和本步到达（离开路网）的车辆
+SIMULATION_VARS = (tc.VAR_TIME, tc.VAR_DEPARTED_VEHICLES_IDS, tc.VAR_ARRIVED_VEHICLES_IDS)
+# 查找领头车辆的距离（米），与 Vehicle.getLeader 保持一致
+LEADER_DISTANCE = 20
+
+# 快照中没有对应值时返回的标记（领头车辆的合法取值可能是 None）
+MISSING = object()
+
+
+class VehicleStateCache():
+    """
+    每个仿真步的车辆状态快照。
+    每辆车出发时通过 traci.vehicle.subscribe 订阅常用变量，之后每步只通过
+    getAllSubscriptionResults 取一次批量结果，Vehicle 的 getter 直接读取该快照，
+    而不是每个 getter 各发一次同步的 TraCI 请求。
+    """
+
+    def __init__(self, extraVars=(), connection=None):
+        """
+        初始化状态缓存。
+        :param extraVars: 除 VEHICLE_VARS 外还需要订阅的车辆变量（如等待时间）
+        :param connection: 使用的 TraCI 连接（traci.getConnection 的返回值），默认为 traci 的当前连接
+        """
+        self._traci = connection if connection is not None else traci
+        self.step = 0  # 快照的步计数，每次刷新出新快照时加一，旧快照随之失效
+        self._time = None  # 当前快照对应的仿真时间
+        self._vars = VEHICLE_VARS + tuple(v for v in extraVars if v not in VEHICLE_VARS)
+        self._parameters = {tc.VAR_LEADER: ("d", LEADER_DISTANCE)}
+        self._results = dict()  # 车辆名称 -> {变量: 值}
+        self._arrived = ()  # 本步到达的车辆名称
+
+    def update(self):
+        """
+        刷新快照。同一仿真时刻内重复调用不会重复取数。
+        :return: 如果生成了新的快照返回 True，否则返回 False
+        """
+        if self._time is None:
+            # 第一次刷新：订阅仿真变量，并为已经在路网中的车辆补订阅
+            self._traci.simulation.subscribe(SIMULATION_VARS)
+            simulation = self._traci.simulation.getSubscriptionResults()
+            departed = self._traci.vehicle.getIDList()
+        else:
+            simulation = self._traci.simulation.getSubscriptionResults()
+            if simulation[tc.VAR_TIME] == self._time:
+                return False
+            departed = simulation[tc.VAR_DEPARTED_VEHICLES_IDS]
+        self._time = simulation[tc.VAR_TIME]
+        self._arrived = simulation[tc.VAR_ARRIVED_VEHICLES_IDS]
+        for vehicle in departed:
+            self._traci.vehicle.subscribe(vehicle, self._vars, parameters=self._parameters)
+        # 已到达的车辆会被 SUMO 自动取消订阅，不会出现在批量结果中
+        self._results = self._traci.vehicle.getAllSubscriptionResults()
+        self.step += 1
+        return True
+
+    def get(self, vehicle, var, default=MISSING):
+        """
+        从当前快照中读取车辆变量。
+        :param vehicle: 车辆名称
+        :param var: TraCI 变量常量
+        :param default: 快照中没有该值时的返回值
+        """
+        values = self._results.get(vehicle)
+        if values is None:
+            return default
+        return values.get(var, default)
+
+    def getVehicleIDs(self):
+        """
+        获取当前快照中的所有车辆名称。
+        """
+        return self._results.keys()
+
+    def getTime(self):
+        """
+        获取快照对应的仿真时间（尚未刷新时为 None）。
+        """
+        return self._time
+
+    def getArrivedIDs(self):
+        """
+        获取本步到达（离开路网）的车辆名称。
+        """
+        return self._arrived
+
+    def getArray(self, var, vehicles=None, default=0.0):
+        """
+        以 NumPy 数组的形式读取多辆车的同一变量，用于向量化统计。
+        :param var: TraCI 变量常量（需为数值型变量）
+        :param vehicles: 车辆名称列表，为 None 时读取快照中的所有车辆（顺序与 getVehicleIDs 一致）
+        :param default: 快照中没有该车辆时使用的值
+        """
+        if vehicles is None:
+            return np.fromiter((values[var] for values in self._results.values()), dtype=np.float64,
+                               count=len(self._results))
+        return np.fromiter((self.get(vehicle, var, default) for vehicle in vehicles), dtype=np.float64)
@@ -0,0 +1,74 @@
+import numpy as np
+
+
+class VehicleArrayStore():
+    """
+    车辆位置、速度和加速度的结构数组（struct-of-arrays）存储。
+    每辆车占用各数组中的一个槽位，所有车辆的离散化动力学更新可以用一次 NumPy 运算完成。
+    数组在扩容时会被替换，使用方应通过属性（如 store.speed）访问，而不要长期持有数组引用。
+    """
+
+    def __init__(self, capacity=256):
+        """
+        初始化存储。
+        :param capacity: 初始槽位数，槽位用完时容量翻倍
+        """
+        self.position = np.zeros(capacity)  # 车辆位置
+        self.speed = np.zeros(capacity)  # 车辆速度
+        self.acceleration = np.zeros(capacity)  # 车辆加速度
+        self.maxSpeed = np.zeros(capacity)  # 车辆最大速度
+        self.active = np.zeros(capacity, dtype=bool)  # 槽位是否被占用
+        self._free = list(range(capacity - 1, -1, -1))  # 空闲槽位（栈，优先复用小下标）
+
+    def __len__(self):
+        return int(self.active.sum())
+
+    def allocate(self, position, speed, acceleration, maxSpeed):
+        """
+        为一辆车分配槽位并写入初始状态。
+        :return: 槽位下标
+        """
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        self.position[slot] = position
+        self.speed[slot] = speed
+        self.acceleration[slot] = acceleration
+        self.maxSpeed[slot] = maxSpeed
+        self.active[slot] = True
+        return slot
+
+    def release(self, slot):
+        """
+        释放槽位，供之后的车辆复用。
+        :param slot: 槽位下标
+        """
+        self.active[slot] = False
+        self._free.append(slot)
+
+    def getState(self, slot):
+        """
+        获取槽位中车辆的状态向量 [位置, 速度]。
+        """
+        return [float(self.position[slot]), float(self.speed[slot])]
+
+    def step(self, T):
+        """
+        按当前加速度对所有车辆做一次离散化的位置和速度更新，速度限制在 [0, 最大速度] 内。
+        :param T: 离散化时间步长
+        """
+        active = self.active
+        speed = self.speed[active]
+        acceleration = self.acceleration[active]
+        self.position[active] += speed * T + 0.5 * acceleration * T * T
+        self.speed[active] = np.clip(speed + acceleration * T, 0, self.maxSpeed[active])
+
+    def _grow(self):
+        """
+        容量翻倍。
+        """
+        capacity = len(self.active)
+        for name in ("position", "speed", "acceleration", "maxSpeed", "active"):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate((array, np.zeros(capacity, dtype=array.dtype))))
+        self._free.extend(range(2 * capacity - 1, capacity - 1, -1))
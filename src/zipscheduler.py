@@ -0,0 +1,101 @@
+import bisect
+
+
+def _longestOrderedRun(entries):
+    """
+    求 entries 中最长的有序子序列（最长递增子序列，O(n log n)）。
+    :param entries: [距离, 加入顺序, 车辆] 列表（加入顺序各不相同，列表比较不会比较到车辆对象）
+    :return: 与 entries 等长的布尔列表，标记属于该子序列的条目
+    """
+    tails = []  # tails[k]：长度为 k + 1 的有序子序列中末尾最小的条目
+    tailIndices = []  # tails 中各条目在 entries 中的下标
+    previous = [-1] * len(entries)  # 每个条目在其子序列中的前一个条目的下标
+    for i, entry in enumerate(entries):
+        k = bisect.bisect_left(tails, entry)
+        previous[i] = tailIndices[k - 1] if k else -1
+        if k == len(tails):
+            tails.append(entry)
+            tailIndices.append(i)
+        else:
+            tails[k] = entry
+            tailIndices[k] = i
+    inRun = [False] * len(entries)
+    i = tailIndices[-1] if tailIndices else -1
+    while i >= 0:
+        inRun[i] = True
+        i = previous[i]
+    return inRun
+
+
+class ZipScheduler():
+    """
+    增量维护的“压缩”通行顺序。
+    车辆按到交叉口的距离排序；每步只重新计算距离，保留仍然有序的最长子序列，只把相对顺序发生变化的车辆重新插入，
+    而不是每步重建“压缩”组合和整个交织顺序。参与“压缩”的车辆集合只在标记为失效后才重建。
+    """
+
+    # 需要重新插入的车辆超过该比例时直接整体排序（逐个插入的总代价为 O(n * 移动数)）
+    MAX_MOVED_FRACTION = 0.125
+
+    def __init__(self, distance, away=None):
+        """
+        初始化调度器。
+        :param distance: 计算车辆到交叉口距离的函数（如 IntersectionController._getLanePosition）
+        :param away: 车辆不在控制车道上时距离函数返回的值（如 1000）；曾在控制车道上、之后距离变为该值的车辆
+                     视为已经通过交叉口，立即从顺序中移除。为 None 时只移除已离开路网（不再活动）的车辆
+        """
+        self._distance = distance
+        self._away = away
+        self._entries = []  # 按 (距离, 加入顺序) 排好序的 [距离, 加入顺序, 车辆] 列表
+        self._dirty = True  # 参与“压缩”的车辆集合是否需要重建
+
+    def __len__(self):
+        return len(self._entries)
+
+    def markDirty(self):
+        """
+        标记参与“压缩”的车辆集合失效（车队加入、离开、成员或车道变化时调用）。
+        """
+        self._dirty = True
+
+    def isDirty(self):
+        return self._dirty
+
+    def rebuild(self, vehicles):
+        """
+        用新的车辆集合重建顺序。
+        :param vehicles: 参与“压缩”的车辆
+        """
+        self._entries = sorted([self._distance(v), i, v] for i, v in enumerate(vehicles))
+        self._dirty = False
+
+    def order(self):
+        """
+        按最新的距离返回车辆通过交叉口的顺序。
+        已离开路网或已通过交叉口的车辆立即移除；其余车辆保留最长的有序子序列，
+        只把顺序发生变化的车辆用二分查找重新插入，变化的车辆较多时整体排序。
+        :return: 车辆列表
+        """
+        away = self._away
+        entries = []
+        ordered = True
+        for entry in self._entries:
+            vehicle = entry[2]
+            distance = self._distance(vehicle)
+            if not vehicle.isActive() or (away is not None and distance == away and entry[0] != away):
+                continue
+            entry[0] = distance
+            if ordered and entries and entry < entries[-1]:
+                ordered = False
+            entries.append(entry)
+        if not ordered:
+            inRun = _longestOrderedRun(entries)
+            moved = [entry for entry, keep in zip(entries, inRun) if not keep]
+            if len(moved) > self.MAX_MOVED_FRACTION * len(entries):
+                entries.sort()
+            else:
+                entries = [entry for entry, keep in zip(entries, inRun) if keep]
+                for entry in moved:
+                    bisect.insort(entries, entry)
+        self._entries = entries
+        return [entry[2] for entry in entries]
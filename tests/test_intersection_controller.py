@@ -0,0 +1,65 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from intersectionController import IntersectionController  # noqa: E402
+
+
+class FakeNetwork():
+    def getControlledLanes(self, tls):
+        return ("in_0",)
+
+
+class FakePlatoon():
+    """只提供预留计算和速度控制需要的接口"""
+
+    def __init__(self, name, position):
+        self.name = name
+        self.position = position
+        self.targetSpeed = None
+        self.released = False
+
+    def getLane(self):
+        return "in_0"
+
+    def getLanePositionFromFront(self):
+        return self.position
+
+    def getSpeed(self):
+        return 10.0
+
+    def getMaxSpeed(self):
+        return 10.0
+
+    def getLength(self):
+        return 20.0
+
+    def setTargetSpeed(self, speed):
+        self.targetSpeed = speed
+
+    def removeTargetSpeed(self):
+        self.released = True
+
+
+def _controller(remainingGreen):
+    controller = IntersectionController("junction", zip=False, network=FakeNetwork())
+
+    def readSignal():
+        controller._reservation.greenLanes = frozenset({"in_0"})
+        controller._reservation.remainingGreen = remainingGreen
+
+    controller._reservation.readSignal = readSignal
+    return controller
+
+
+def test_nearer_platoon_reserves_first_when_added_out_of_order():
+    far, near = FakePlatoon("far", 200.0), FakePlatoon("near", 10.0)
+    controller = _controller(remainingGreen=10.0)
+    # 较远的车队先加入控制器
+    controller.addPlatoon(far)
+    controller.addPlatoon(near)
+    controller.update()
+    # 较近的车队在绿灯内到达，先预留并放行；较远的车队被保留
+    assert near.released and near.targetSpeed is None
+    assert not far.released and far.targetSpeed is not None